@@ -0,0 +1,135 @@
+# benchmarks/bench_course_json.py
+"""Micro-benchmark: tolerant incremental course JSON parser vs. the old regex cascade.
+
+Run from the backend directory:
+
+    python benchmarks/bench_course_json.py [--modules 10] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_stream import IncrementalJSONParser, parse_tolerant_json  # noqa: E402
+
+FALLBACK = {"modules": [{"title": "fallback"}]}
+
+
+def legacy_cascade(course_content):
+    """The JSON recovery create_course used before the incremental parser"""
+    try:
+        return json.loads(course_content)
+    except json.JSONDecodeError:
+        match = re.search(r'```json\s*([\s\S]*?)\s*```', course_content)
+        if match:
+            try:
+                return json.loads(match.group(1))
+            except json.JSONDecodeError:
+                cleaned_json = match.group(1).strip().replace('\n', '')
+                try:
+                    return json.loads(cleaned_json)
+                except json.JSONDecodeError:
+                    return FALLBACK
+        else:
+            try:
+                json_match = re.search(r'({[\s\S]*})', course_content)
+                if json_match:
+                    return json.loads(json_match.group(1))
+                return FALLBACK
+            except Exception:
+                return FALLBACK
+
+
+def tolerant(course_content):
+    """What parse_course_content does for a non-streamed completion"""
+    result, parser = parse_tolerant_json(course_content, collect_key="modules")
+    items = parser.items if parser is not None else []
+    if not isinstance(result, dict) or not isinstance(result.get("modules"), list):
+        return {"modules": items} if items else FALLBACK
+    return result
+
+
+def streamed(course_content, chunk_size=16):
+    """Feeding the parser token-sized chunks as the streaming endpoint does"""
+    parser = IncrementalJSONParser(collect_key="modules")
+    for i in range(0, len(course_content), chunk_size):
+        parser.feed(course_content[i:i + chunk_size])
+    result = parser.result()
+    if not isinstance(result, dict) or not isinstance(result.get("modules"), list):
+        return {"modules": parser.items} if parser.items else FALLBACK
+    return result
+
+
+def make_course(modules, lessons=5):
+    return {
+        "modules": [
+            {
+                "title": f"Module {m + 1}",
+                "lessons": [
+                    {
+                        "title": f"Lesson {l + 1}",
+                        "content": "<h3>Section</h3><p>" + "Lorem ipsum {dolor} [sit] amet. " * 80 + "</p>",
+                        "interactive_elements": "<div class='interactive-exercise'><p>Try it</p></div>",
+                        "knowledge_checks": [
+                            {
+                                "type": "multiple_choice",
+                                "question": "Which option?",
+                                "options": ["A", "B", "C", "D"],
+                                "correct_answer": "A"
+                            }
+                        ] * 3
+                    }
+                    for l in range(lessons)
+                ]
+            }
+            for m in range(modules)
+        ]
+    }
+
+
+def cases(modules):
+    text = json.dumps(make_course(modules), indent=2)
+    truncated = text[: int(len(text) * 0.85)]
+    return {
+        "valid": text,
+        "fenced": "```json\n" + text + "\n```",
+        "prose + json": "Here is your course:\n" + text + "\nLet me know if you need changes.",
+        "truncated": truncated,
+        "fenced truncated": "```json\n" + truncated,
+        # Unbalanced braces in trailing prose make the greedy {...} regex backtrack
+        "truncated + stray braces": truncated + "\n" + "{ not json " * 200,
+    }
+
+
+def bench(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(text)
+        best = min(best, time.perf_counter() - start)
+    modules = len(result.get("modules", [])) if result is not FALLBACK else 0
+    return best * 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'case':<26}{'bytes':>10}{'legacy ms':>11}{'mods':>6}"
+          f"{'tolerant ms':>13}{'mods':>6}{'stream ms':>11}{'mods':>6}")
+    for name, text in cases(args.modules).items():
+        legacy_ms, legacy_modules = bench(legacy_cascade, text, args.repeat)
+        tolerant_ms, tolerant_modules = bench(tolerant, text, args.repeat)
+        stream_ms, stream_modules = bench(streamed, text, args.repeat)
+        print(f"{name:<26}{len(text):>10}{legacy_ms:>11.2f}{legacy_modules:>6}"
+              f"{tolerant_ms:>13.2f}{tolerant_modules:>6}{stream_ms:>11.2f}{stream_modules:>6}")
+
+
+if __name__ == "__main__":
+    main()
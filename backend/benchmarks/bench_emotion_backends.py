@@ -0,0 +1,97 @@
+# benchmarks/bench_emotion_backends.py
+"""CPU benchmark of the emotion classifier backends (torch, torch-int8, onnx).
+
+Run from the backend directory:
+
+    python benchmarks/bench_emotion_backends.py [--backends torch,torch-int8,onnx] [--requests 200]
+
+Each backend runs in a fresh process so its peak RSS is measured in
+isolation. Reports load time, single-message p50/p99 latency, batched
+throughput, peak RSS and how often its labels agree with fp32 torch.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEXTS = [
+    "I don't get this at all, I've tried three times",
+    "Oh wow, so that's why the leaves change colour?",
+    "I finally solved it and I'm so happy!",
+    "This is boring, when does class end",
+    "My grade dropped and I feel really sad about it",
+    "I'm scared I will fail the exam tomorrow",
+    "Why does the moon change shape every night?",
+    "That makes me so angry, the question was unfair",
+]
+
+CHILD = """
+import json, resource, sys, time
+from emotion import EmotionClassifier
+texts, requests, batch_size = {texts!r}, {requests}, {batch_size}
+started = time.perf_counter()
+classifier = EmotionClassifier(backend={backend!r})
+classifier.load()
+load_seconds = time.perf_counter() - started
+labels = [r["label"] for r in classifier.classify_batch(texts)]
+for text in texts:
+    classifier(text)
+latencies = []
+for i in range(requests):
+    start = time.perf_counter()
+    classifier(texts[i % len(texts)])
+    latencies.append(time.perf_counter() - start)
+batch = [texts[i % len(texts)] for i in range(batch_size)]
+start = time.perf_counter()
+rounds = max(1, requests // batch_size)
+for _ in range(rounds):
+    classifier.classify_batch(batch)
+throughput = rounds * batch_size / (time.perf_counter() - start)
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+print(json.dumps({{"load_seconds": load_seconds, "latencies": latencies, "throughput": throughput,
+                  "rss_mb": rss_mb, "labels": labels}}))
+"""
+
+
+def run_backend(backend, requests, batch_size):
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD.format(texts=TEXTS, requests=requests, batch_size=batch_size, backend=backend)],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return {"error": (result.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare emotion classifier inference backends")
+    parser.add_argument("--backends", default="torch,torch-int8,onnx")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    results = {b: run_backend(b, args.requests, args.batch_size) for b in args.backends.split(",")}
+    reference = results.get("torch", {}).get("labels")
+
+    print(f"{'backend':<12}{'load s':>8}{'p50 ms':>9}{'p99 ms':>9}{'msgs/s':>9}{'RSS MB':>9}{'agree':>8}")
+    for backend, r in results.items():
+        if "error" in r:
+            print(f"{backend:<12} failed: {r['error']}")
+            continue
+        agree = (sum(a == b for a, b in zip(reference, r["labels"])) / len(TEXTS)) if reference else None
+        print(f"{backend:<12}{r['load_seconds']:>8.1f}{percentile(r['latencies'], 0.5) * 1000:>9.1f}"
+              f"{percentile(r['latencies'], 0.99) * 1000:>9.1f}{r['throughput']:>9.1f}{r['rss_mb']:>9.0f}"
+              f"{(f'{agree:.0%}' if agree is not None else '-'):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_emotion_batching.py
+"""Throughput benchmark: micro-batched emotion classification vs. one text per call.
+
+Run from the backend directory:
+
+    python benchmarks/bench_emotion_batching.py [--clients 32] [--requests 512]
+    python benchmarks/bench_emotion_batching.py --synthetic   # no model download
+
+``single`` reproduces the previous path (one forward pass per message on the
+event loop); ``batched`` goes through EmotionBatcher. ``--synthetic`` replaces
+the model with a fixed per-call plus per-item cost to show the scheduling
+effect without transformers installed.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotion import EmotionBatcher, EmotionClassifier  # noqa: E402
+from synthetic_emotion import SyntheticPipeline  # noqa: E402
+
+MESSAGES = [
+    "I don't get this at all, I've tried three times",
+    "Oh wow, so that's why the leaves change colour?",
+    "ok",
+    "Can you give me a harder problem?",
+    "This is boring, when does class end",
+    "I think I understand fractions now, thanks!",
+]
+
+
+async def run(mode, classifier, clients, total, batch_size, wait_ms):
+    batcher = EmotionBatcher(classifier, max_batch=batch_size, max_wait_ms=wait_ms)
+    latencies = []
+    counter = iter(range(total))
+
+    async def client():
+        # Closed loop: each client sends its next message as soon as the previous one
+        # returns, and latency counts from then, including time the event loop was blocked
+        ready = time.perf_counter()
+        for i in counter:
+            text = MESSAGES[i % len(MESSAGES)]
+            if mode == "single":
+                classifier(text)
+                await asyncio.sleep(0)
+            else:
+                await batcher.classify(text)
+            done = time.perf_counter()
+            latencies.append(done - ready)
+            ready = done
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    await batcher.stop()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    avg_batch = batcher.stats()["avg_batch"] if mode == "batched" else 1.0
+    print(f"{mode:<10}{total / elapsed:>12.1f}{statistics.median(latencies) * 1000:>10.1f}"
+          f"{p99 * 1000:>10.1f}{avg_batch:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare batched and per-message emotion classification")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent callers")
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--wait-ms", type=float, default=2)
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--call-ms", type=float, default=20, help="synthetic cost per forward pass")
+    parser.add_argument("--item-ms", type=float, default=2, help="synthetic cost per text")
+    args = parser.parse_args()
+
+    classifier = EmotionClassifier()
+    if args.synthetic:
+        classifier._pipeline = SyntheticPipeline(args.call_ms, args.item_ms)
+    else:
+        started = time.perf_counter()
+        classifier.load()
+        classifier("warm up")
+        print(f"model loaded in {time.perf_counter() - started:.1f}s")
+
+    print(f"{'mode':<10}{'msgs/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'avg batch':>11}")
+    for mode in ("single", "batched"):
+        asyncio.run(run(mode, classifier, args.clients, args.requests, args.batch_size, args.wait_ms))
+
+
+if __name__ == "__main__":
+    main()
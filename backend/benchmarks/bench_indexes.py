@@ -0,0 +1,213 @@
+# benchmarks/bench_indexes.py
+"""Query-plan and latency check for the per-user indexes in models.py.
+
+Run from the backend directory:
+
+    python benchmarks/bench_indexes.py [--users 200] [--rows 100] [--repeat 50]
+    python benchmarks/bench_indexes.py --record benchmarks/index_baseline.json
+    python benchmarks/bench_indexes.py --compare benchmarks/index_baseline.json
+
+Seeds a temporary SQLite database (or ``--url``) with ``--users`` teachers,
+each owning ``--rows`` rows in every per-user table, then runs the queries the
+list and lookup endpoints issue. Each query is measured twice: with the
+``__table_args__`` indexes dropped ("before") and after ensure_indexes() restores them.
+Both runs print the plan and latency. ``--compare`` exits non-zero when a query
+that used an index no longer does, or when it got more than ``--tolerance``
+times slower than the recorded run.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Index, and_, select, text  # noqa: E402
+
+import models  # noqa: E402
+from database import Base, create_engine_for_url, ensure_indexes  # noqa: E402
+
+PAGE = 101  # list endpoints fetch one row past the page size
+
+
+def seed(engine, users, rows):
+    rng = random.Random(7)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": u, "email": f"teacher{u}@example.com", "name": f"Teacher {u}", "password": "x"}
+            for u in range(1, users + 1)
+        ])
+        per_user = [(u, i) for u in range(1, users + 1) for i in range(rows)]
+        rng.shuffle(per_user)  # interleave owners the way real traffic does
+        ids = {}
+        for model, extra in (
+            (models.LessonPlan, lambda u, i: {"title": f"Plan {i}", "content": "x" * 500}),
+            (models.Assessment, lambda u, i: {"title": f"Assessment {i}", "content": "x" * 500}),
+            (models.Activity, lambda u, i: {"title": f"Activity {i}"}),
+            (models.Resource, lambda u, i: {"filename": f"file{i}.pdf"}),
+            (models.Course, lambda u, i: {"title": f"Course {i}", "content": "{}"}),
+            (models.Quiz, lambda u, i: {"title": f"Quiz {i}", "questions": []}),
+            (models.FlashcardSet, lambda u, i: {"title": f"Set {i}", "cards": []}),
+        ):
+            conn.execute(model.__table__.insert(), [{"user_id": u, **extra(u, i)} for u, i in per_user])
+        conn.execute(models.Class.__table__.insert(), [
+            {"id": n + 1, "teacher_id": u, "name": f"Class {i}"} for n, (u, i) in enumerate(per_user)
+        ])
+        classes = len(per_user)
+        conn.execute(models.StudentRecord.__table__.insert(), [
+            {"class_id": rng.randint(1, classes), "user_id": u, "student_name": f"Student {i}"} for u, i in per_user
+        ])
+        conn.execute(models.CourseProgress.__table__.insert(), [
+            {"course_id": n + 1, "user_id": u} for n, (u, i) in enumerate(per_user)
+        ])
+        conn.execute(models.QuizAttempt.__table__.insert(), [
+            {"quiz_id": n + 1, "user_id": u, "score": 1.0} for n, (u, i) in enumerate(per_user)
+        ])
+        conn.execute(models.FlashcardReview.__table__.insert(), [
+            {"flashcard_set_id": n % classes + 1, "user_id": u, "card_index": i % 20, "difficulty_rating": 3}
+            for n, (u, i) in enumerate(per_user)
+        ])
+        ids["class"] = conn.execute(select(models.StudentRecord.class_id).limit(1)).scalar()
+        ids["course"], ids["course_user"] = conn.execute(
+            select(models.CourseProgress.course_id, models.CourseProgress.user_id).limit(1)).first()
+        ids["set"], ids["set_user"], ids["card"] = conn.execute(select(
+            models.FlashcardReview.flashcard_set_id, models.FlashcardReview.user_id, models.FlashcardReview.card_index
+        ).limit(1)).first()
+    return ids
+
+
+def user_page(model, owner_column, owner):
+    return select(model).filter(owner_column == owner).order_by(model.created_at, model.id).limit(PAGE)
+
+
+def build_queries(ids, user):
+    return {
+        "lesson_plans page": user_page(models.LessonPlan, models.LessonPlan.user_id, user),
+        "assessments page": user_page(models.Assessment, models.Assessment.user_id, user),
+        "activities page": user_page(models.Activity, models.Activity.user_id, user),
+        "resources page": user_page(models.Resource, models.Resource.user_id, user),
+        "classes page": user_page(models.Class, models.Class.teacher_id, user),
+        "class students page": user_page(models.StudentRecord, models.StudentRecord.class_id, ids["class"]),
+        "courses page": user_page(models.Course, models.Course.user_id, user),
+        "quizzes page": user_page(models.Quiz, models.Quiz.user_id, user),
+        "flashcards page": user_page(models.FlashcardSet, models.FlashcardSet.user_id, user),
+        "course progress lookup": select(models.CourseProgress).filter(and_(
+            models.CourseProgress.course_id == ids["course"],
+            models.CourseProgress.user_id == ids["course_user"])),
+        "flashcard review lookup": select(models.FlashcardReview).filter(and_(
+            models.FlashcardReview.flashcard_set_id == ids["set"],
+            models.FlashcardReview.user_id == ids["set_user"],
+            models.FlashcardReview.card_index == ids["card"])),
+    }
+
+
+def explain(conn, stmt):
+    sql = str(stmt.compile(conn, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        return " | ".join(row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql)))
+    return " | ".join(row[0].strip() for row in conn.execute(text("EXPLAIN " + sql)))
+
+
+def uses_index(plan):
+    lowered = plan.lower()
+    full_scan = ("scan " in lowered and "using" not in lowered) or "seq scan" in lowered
+    return not full_scan and "index" in lowered
+
+
+def measure(engine, queries, repeat):
+    results = {}
+    with engine.connect() as conn:
+        if conn.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+        for name, stmt in queries.items():
+            conn.execute(stmt).all()  # warm the page cache
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(stmt).all()
+                timings.append(time.perf_counter() - start)
+            plan = explain(conn, stmt)
+            results[name] = {
+                "p50_ms": statistics.median(timings) * 1000,
+                "plan": plan,
+                "uses_index": uses_index(plan),
+            }
+    return results
+
+
+def drop_table_arg_indexes(engine):
+    """Drop the indexes declared in __table_args__, keeping column-level ones"""
+    with engine.begin() as conn:
+        for mapper in Base.registry.mappers:
+            for arg in getattr(mapper.class_, "__table_args__", ()):
+                if isinstance(arg, Index):
+                    conn.execute(text(f"DROP INDEX IF EXISTS {arg.name}"))
+
+
+def compare(baseline, current, tolerance):
+    problems = []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if before["uses_index"] and not result["uses_index"]:
+            problems.append(f"{name}: no longer uses an index ({result['plan']})")
+        if result["p50_ms"] > max(before["p50_ms"] * tolerance, 1.0):
+            problems.append(f"{name}: p50 {result['p50_ms']:.2f} ms vs {before['p50_ms']:.2f} ms recorded")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record query plans and latencies of the per-user indexes")
+    parser.add_argument("--url", help="database to seed (default: a temporary SQLite file); it is wiped")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=100, help="rows per user in every per-user table")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--record", help="write the indexed results to this JSON file")
+    parser.add_argument("--compare", help="fail on regressions against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=3.0, help="allowed slowdown factor for --compare")
+    parser.add_argument("--plans", action="store_true", help="print the query plans")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='edumate-idx-'), 'bench.db')}"
+    engine = create_engine_for_url(url)
+    started = time.perf_counter()
+    ids = seed(engine, args.users, args.rows)
+    print(f"seeded {args.users} users x {args.rows} rows per table in {time.perf_counter() - started:.1f}s")
+    queries = build_queries(ids, user=args.users // 2)
+
+    drop_table_arg_indexes(engine)
+    before = measure(engine, queries, args.repeat)
+    ensure_indexes(Base.metadata, engine)
+    after = measure(engine, queries, args.repeat)
+
+    print(f"\n{'query':<26}{'before ms':>11}{'after ms':>10}{'speedup':>9}  index")
+    for name in queries:
+        b, a = before[name], after[name]
+        print(f"{name:<26}{b['p50_ms']:>11.3f}{a['p50_ms']:>10.3f}{b['p50_ms'] / a['p50_ms']:>8.1f}x  "
+              f"{'yes' if a['uses_index'] else 'NO'}")
+        if args.plans:
+            print(f"    before: {b['plan']}\n    after:  {a['plan']}")
+
+    if args.record:
+        with open(args.record, "w") as f:
+            json.dump(after, f, indent=2)
+        print(f"\nrecorded results to {args.record}")
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(json.load(f), after, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print("\nno regressions against", args.compare)
+
+
+if __name__ == "__main__":
+    main()
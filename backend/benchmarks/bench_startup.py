@@ -0,0 +1,86 @@
+# benchmarks/bench_startup.py
+"""Startup budget check: time and peak RSS of importing ``main`` in a fresh process.
+
+Run from the backend directory; exits non-zero when the budget is exceeded:
+
+    python benchmarks/bench_startup.py [--runs 5] [--max-seconds 5] [--max-rss-mb 300]
+
+``--warm`` also loads the emotion model, to measure a worker started with
+``EMOTION_WARMUP=startup`` (budgets then need to be raised accordingly).
+Budgets default to ``STARTUP_BUDGET_SECONDS`` and ``STARTUP_BUDGET_RSS_MB``.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported just by loading the app
+HEAVY_MODULES = ("torch", "transformers", "textblob", "nltk")
+
+CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+if {warm}:
+    import asyncio
+    asyncio.run(main.emotion_classifier.warm_up())
+    elapsed = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# ru_maxrss is kilobytes on Linux and bytes on macOS
+rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss_mb, "heavy_modules": heavy}}))
+"""
+
+
+def measure(warm: bool, env):
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD.format(warm=warm, heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"importing main failed with exit code {result.returncode}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time and memory budget of main.py")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=float(os.getenv("STARTUP_BUDGET_SECONDS", "5")))
+    parser.add_argument("--max-rss-mb", type=float, default=float(os.getenv("STARTUP_BUDGET_RSS_MB", "300")))
+    parser.add_argument("--warm", action="store_true", help="also load the emotion model")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the benchmark away from the real database
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'startup.db')}"}
+        runs = [measure(args.warm, env) for _ in range(args.runs)]
+
+    seconds = statistics.median(r["seconds"] for r in runs)
+    rss_mb = max(r["rss_mb"] for r in runs)
+    heavy = sorted({m for r in runs for m in r["heavy_modules"]})
+    print(f"import main: median {seconds:.2f}s over {args.runs} runs (budget {args.max_seconds:.2f}s), "
+          f"peak RSS {rss_mb:.0f} MB (budget {args.max_rss_mb:.0f} MB)")
+    print(f"heavy modules loaded: {', '.join(heavy) or 'none'}")
+
+    failures = []
+    if seconds > args.max_seconds:
+        failures.append(f"import time {seconds:.2f}s exceeds {args.max_seconds:.2f}s")
+    if rss_mb > args.max_rss_mb:
+        failures.append(f"peak RSS {rss_mb:.0f} MB exceeds {args.max_rss_mb:.0f} MB")
+    if heavy and not args.warm:
+        failures.append(f"model dependencies imported at startup: {', '.join(heavy)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# benchmarks/eval_emotion_cascade.py
+"""Offline comparison of the cascading emotion detector with always running the model.
+
+Run from the backend directory:
+
+    python benchmarks/eval_emotion_cascade.py [--data messages.jsonl] [--threshold 0.6] [--repeat 2]
+    python benchmarks/eval_emotion_cascade.py --synthetic   # no model download
+
+``--data`` is JSONL with a ``text`` field and an optional gold ``label`` (one
+of emotion.TUTOR_EMOTIONS); without it a small built-in sample of tutor
+messages is used. Both paths are compared in the tutor's vocabulary. Reports
+the cascade's agreement with the always-model labels (and accuracy against
+gold labels when given, with how many gold messages contain lexicon cues), per-message latency of both paths and which stage
+resolved each message. ``--repeat`` replays the set to show cache hits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+# Measure one forward pass per message, without the micro-batching window
+os.environ["EMOTION_BATCHING"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import emotion  # noqa: E402
+from synthetic_emotion import SyntheticPipeline  # noqa: E402
+
+# Tutor emotions judged by hand; worded without the lexicon's cue words, so
+# the lexicon stage gets no head start on the gold labels
+SAMPLE = [
+    {"text": "ok", "label": "neutral"},
+    {"text": "thanks!", "label": "neutral"},
+    {"text": "I've read this chapter three times and nothing sticks", "label": "stressed"},
+    {"text": "My test is tomorrow and my hands are shaking", "label": "stressed"},
+    {"text": "I keep getting a different answer every time I try this equation", "label": "stressed"},
+    {"text": "Everyone else finished ages ago and I'm still on question one", "label": "stressed"},
+    {"text": "My grade dropped and I feel really sad about it", "label": "stressed"},
+    {"text": "I finally solved it and I'm so happy!", "label": "confident"},
+    {"text": "All ten came out right on the first try", "label": "confident"},
+    {"text": "I can do these in my head now, give me something bigger", "label": "confident"},
+    {"text": "Is there a reason prime numbers never run out?", "label": "curious"},
+    {"text": "Does the same rule work for negative numbers too?", "label": "curious"},
+    {"text": "Where did the water on Earth come from in the first place?", "label": "curious"},
+    {"text": "can we stop now", "label": "disengaged"},
+    {"text": "do I really have to do this one", "label": "disengaged"},
+    {"text": "Can you explain the water cycle?", "label": "neutral"},
+    {"text": "What is 7 times 8?", "label": "neutral"},
+    {"text": "Explain the difference between mitosis and meiosis", "label": "neutral"},
+]
+
+
+def synthetic_polarity(text):
+    lowered = text.lower()
+    return -0.7 if any(w in lowered for w in ("hate", "sad", "worried")) else 0.1
+
+
+def load_messages(path):
+    if not path:
+        return SAMPLE
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return (statistics.mean(ordered) * 1000, ordered[int(0.5 * (len(ordered) - 1))] * 1000,
+            ordered[int(0.95 * (len(ordered) - 1))] * 1000)
+
+
+async def evaluate(messages, threshold, repeat):
+    baseline, baseline_latency = [], []
+    for message in messages:
+        start = time.perf_counter()
+        baseline.append(emotion.tutor_emotion(await emotion.detect_emotion_local(message["text"])))
+        baseline_latency.append(time.perf_counter() - start)
+
+    cascade = emotion.EmotionCascade(threshold=threshold)
+    predictions, cascade_latency = [], []
+    for _ in range(repeat):
+        predictions = []
+        for message in messages:
+            start = time.perf_counter()
+            predictions.append(emotion.tutor_emotion(await cascade.detect(message["text"])))
+            cascade_latency.append(time.perf_counter() - start)
+
+    agreement = sum(a == b for a, b in zip(baseline, predictions)) / len(messages)
+    print(f"messages: {len(messages)}  threshold: {threshold}  passes: {repeat}")
+    print(f"cascade agreement with always-model labels: {agreement:.1%}")
+
+    gold = [m.get("label") for m in messages]
+    if all(gold):
+        cued = sum(emotion.lexicon_scores(m["text"])[1] > 0 for m in messages)
+        print(f"gold messages with lexicon cues: {cued}/{len(messages)}")
+        for name, labels in (("always-model", baseline), ("cascade", predictions)):
+            accuracy = sum(a == b for a, b in zip(gold, labels)) / len(messages)
+            print(f"{name:<14} accuracy vs gold: {accuracy:.1%}")
+
+    print(f"\n{'path':<14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, latencies in (("always-model", baseline_latency), ("cascade", cascade_latency)):
+        mean, p50, p95 = summarize(latencies)
+        print(f"{name:<14}{mean:>10.2f}{p50:>10.2f}{p95:>10.2f}")
+
+    total = sum(cascade.counters.values())
+    print("\nresolved by stage:")
+    for stage, count in cascade.counters.items():
+        print(f"  {stage:<10}{count:>6}  {count / total:>6.1%}")
+
+    disagreements = [(m["text"], b, p) for m, b, p in zip(messages, baseline, predictions) if b != p]
+    if disagreements:
+        print("\ndisagreements (text, always-model, cascade):")
+        for text, b, p in disagreements:
+            print(f"  {text[:60]!r:<64} {b:<11} {p}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the cascading emotion detector")
+    parser.add_argument("--data")
+    parser.add_argument("--threshold", type=float, default=emotion.EMOTION_CASCADE_THRESHOLD)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--call-ms", type=float, default=25, help="synthetic cost per forward pass")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        emotion.emotion_classifier._pipeline = SyntheticPipeline(args.call_ms)
+        emotion.sentiment_polarity = synthetic_polarity
+    else:
+        emotion.emotion_classifier.load()
+        emotion.emotion_classifier("warm up")
+        emotion.sentiment_polarity("warm up")
+
+    asyncio.run(evaluate(load_messages(args.data), args.threshold, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
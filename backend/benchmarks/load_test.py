@@ -0,0 +1,87 @@
+# benchmarks/load_test.py
+"""Throughput/latency load test for the generation endpoints.
+
+Start the API against the offline stub provider, then point this script at it:
+
+    LLM_PROVIDER=stub LLM_STUB_LATENCY=lognormal:-0.7,0.4 uvicorn main:app --workers 1
+    python benchmarks/load_test.py --url http://localhost:8000 --concurrency 32 --requests 200
+
+Record real completions once with ``LLM_CASSETTE=run.jsonl LLM_CASSETTE_MODE=record``
+and replay them offline with ``LLM_CASSETTE_MODE=replay``.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+SCENARIOS = {
+    "ai_generate": lambda i: ("POST", "/ai/generate", {
+        "tool_type": "activity",
+        "parameters": {"activity_type": "game", "subject": "Science", "grade_level": "5",
+                       "topic": f"Topic {i}", "duration": "30 minutes"}
+    }),
+    "courses": lambda i: ("POST", "/courses", {
+        "title": f"Course {i}", "subject": "Biology", "difficulty_level": "Beginner",
+        "learning_style": "Visual", "pace": "Medium"
+    }),
+    "tutor": lambda i: ("POST", "/chat/emotion-aware", {
+        "user_input": f"I don't understand question {i} about photosynthesis"
+    }),
+}
+
+
+async def login(client):
+    email = f"load-{uuid.uuid4().hex[:8]}@example.com"
+    await client.post("/register", json={"email": email, "name": "Load Test", "password": "load-test"})
+    response = await client.post("/login", data={"username": email, "password": "load-test"})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_scenario(client, headers, name, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        method, path, body = SCENARIOS[name](i)
+        async with semaphore:
+            start = time.perf_counter()
+            # Defeat the generation cache so every request reaches the provider
+            response = await client.request(method, path, json=body,
+                                            headers={**headers, "Cache-Control": "no-cache"})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"{name:<12}{total:>8}{errors:>8}{total / elapsed:>10.1f}"
+          f"{statistics.median(latencies) * 1000:>10.0f}{p(0.95):>10.0f}{p(0.99):>10.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test the generation endpoints")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=600, limits=limits) as client:
+        headers = await login(client)
+        print(f"{'scenario':<12}{'requests':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name in args.scenario or sorted(SCENARIOS):
+            await run_scenario(client, headers, name, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+# course_structure.py
+"""Split generated course documents into module and lesson rows, and back.
+
+A course document is ``{"modules": [{"title", "lessons": [{"title", "content",
+"interactive_elements", "knowledge_checks"}]}], ...}``. Modules and lessons
+are stored in their own tables so a single lesson can be read or changed on
+its own; Course.content keeps whatever top-level keys remain. Unknown module
+and lesson keys go to ``extra`` so assembling the document is lossless.
+"""
+import json
+
+from sqlalchemy import select
+
+import models
+
+LESSON_FIELDS = ("title", "content", "interactive_elements", "knowledge_checks")
+
+
+def build_modules(content_json: dict):
+    """Return (top-level fields without modules, CourseModule rows)"""
+    overview = {key: value for key, value in content_json.items() if key != "modules"}
+    modules = []
+    for position, module in enumerate(content_json.get("modules") or []):
+        lessons = [
+            models.CourseLesson(
+                position=index,
+                title=lesson.get("title"),
+                content=lesson.get("content"),
+                interactive_elements=lesson.get("interactive_elements"),
+                knowledge_checks=lesson.get("knowledge_checks") or [],
+                extra={k: v for k, v in lesson.items() if k not in LESSON_FIELDS} or None
+            )
+            for index, lesson in enumerate(module.get("lessons") or [])
+        ]
+        modules.append(models.CourseModule(
+            position=position,
+            title=module.get("title"),
+            extra={k: v for k, v in module.items() if k not in ("title", "lessons")} or None,
+            lessons=lessons
+        ))
+    return overview, modules
+
+
+def lesson_document(lesson) -> dict:
+    return {
+        "title": lesson.title,
+        "content": lesson.content,
+        "interactive_elements": lesson.interactive_elements,
+        "knowledge_checks": lesson.knowledge_checks or [],
+        **(lesson.extra or {})
+    }
+
+
+def course_document(course) -> str:
+    """Full course document as a JSON string; course.modules (and their lessons) must be loaded"""
+    try:
+        document = json.loads(course.content) if course.content else {}
+    except ValueError:
+        return course.content
+    if not isinstance(document, dict) or (not course.modules and "modules" in document):
+        # Not split into rows yet: serve the stored document unchanged
+        return course.content
+    document["modules"] = [
+        {"title": module.title, **(module.extra or {}), "lessons": [lesson_document(l) for l in module.lessons]}
+        for module in course.modules
+    ]
+    return json.dumps(document)
+
+
+def migrate_course_blobs(session_factory, batch_size: int = 50) -> int:
+    """Split courses still holding the whole document in Course.content into rows"""
+    migrated = 0
+    last_id = 0
+    while True:
+        db = session_factory()
+        try:
+            courses = db.scalars(
+                select(models.Course)
+                .filter(models.Course.id > last_id, models.Course.content.like('%"modules"%'))
+                .filter(~models.Course.modules.any())
+                .order_by(models.Course.id)
+                .limit(batch_size)
+            ).all()
+            if not courses:
+                return migrated
+            for course in courses:
+                last_id = course.id
+                try:
+                    content_json = json.loads(course.content)
+                except (TypeError, ValueError):
+                    print(f"Course {course.id}: content is not valid JSON, leaving it as is")
+                    continue
+                if not isinstance(content_json, dict) or not isinstance(content_json.get("modules"), list):
+                    continue
+                overview, modules = build_modules(content_json)
+                course.modules = modules
+                course.module_count = len(modules)
+                course.content = json.dumps(overview)
+                migrated += 1
+            db.commit()
+        finally:
+            db.close()
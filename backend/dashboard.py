@@ -0,0 +1,154 @@
+# dashboard.py
+"""Aggregated dashboard data with a per-user cache.
+
+build_summary() answers the dashboard with a few COUNT/LIMIT queries instead
+of the full item lists. Results are cached per user in process memory, and
+handlers that create, change or delete a user's content call
+dashboard_cache.invalidate(user_id). Each worker process keeps its own cache,
+so DASHBOARD_CACHE_TTL bounds how stale another worker's copy can get.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, literal, select, union_all
+
+import models
+
+DASHBOARD_RECENT_MAX = int(os.getenv("DASHBOARD_RECENT_MAX", "20"))
+POPULAR_SUBJECTS = 5
+
+# (item type, counts key, model); every type is counted
+ITEM_TYPES = (
+    ("lesson_plan", "lesson_plans", models.LessonPlan),
+    ("assessment", "assessments", models.Assessment),
+    ("activity", "activities", models.Activity),
+    ("resource", "resources", models.Resource),
+    ("course", "courses", models.Course),
+    ("quiz", "quizzes", models.Quiz),
+    ("flashcard_set", "flashcard_sets", models.FlashcardSet),
+)
+# Types listed as recent items and used for activity figures (resources have no title)
+TITLED = [(item_type, model) for item_type, _, model in ITEM_TYPES if item_type != "resource"]
+WITH_SUBJECT = (models.LessonPlan, models.Assessment, models.Course)
+
+
+class DashboardCache:
+    """Summaries per (user, variant) that expire after a TTL or on invalidate()"""
+
+    def __init__(self, ttl_seconds: float = None, max_users: int = None):
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+        self.max_users = max_users or int(os.getenv("DASHBOARD_CACHE_MAX_USERS", "1024"))
+        self._entries = OrderedDict()  # user_id -> {variant: (value, expires_at)}
+        self._versions = {}  # user_id -> number of invalidations
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def version(self, user_id: int) -> int:
+        """Read before computing a summary and pass to set()"""
+        return self._versions.get(user_id, 0)
+
+    def get(self, user_id: int, variant):
+        with self._lock:
+            entry = self._entries.get(user_id, {}).get(variant)
+            if entry is None or entry[1] <= time.monotonic():
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.counters["hits"] += 1
+            return entry[0]
+
+    def set(self, user_id: int, variant, value, version: int):
+        with self._lock:
+            # An invalidation while the summary was computed makes it stale already
+            if self.ttl <= 0 or version != self.version(user_id):
+                return
+            self._entries.setdefault(user_id, {})[variant] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._versions[user_id] = self.version(user_id) + 1
+            self.counters["invalidations"] += 1
+
+    def stats(self):
+        return {**self.counters, "users": len(self._entries), "ttl_seconds": self.ttl}
+
+
+def count_of(model, user_id: int, since: datetime = None):
+    stmt = select(func.count(model.id)).filter(model.user_id == user_id)
+    if since is not None:
+        stmt = stmt.filter(model.created_at >= since)
+    return stmt.scalar_subquery()
+
+
+async def build_summary(db, user_id: int, recent: int = 5) -> dict:
+    """Counts, the most recent items and activity figures for one user"""
+    now = datetime.now(timezone.utc)
+    month_ago = now - timedelta(days=30)
+
+    # All counts and the average progress in one statement of scalar subqueries
+    totals = (await db.execute(select(
+        *(count_of(model, user_id).label(key) for _, key, model in ITEM_TYPES),
+        *(count_of(model, user_id, month_ago).label(f"{item_type}_30d") for item_type, model in TITLED),
+        select(func.avg(models.CourseProgress.progress_percentage))
+        .filter(models.CourseProgress.user_id == user_id)
+        .scalar_subquery().label("average_progress")
+    ))).one()._mapping
+
+    # The newest rows of each type (each served by its (user_id, created_at, id) index), merged
+    newest = union_all(*(
+        select(
+            select(literal(item_type).label("type"), model.id, model.title, model.created_at)
+            .filter(model.user_id == user_id)
+            .order_by(model.created_at.desc(), model.id.desc())
+            .limit(recent)
+            .subquery()
+        )
+        for item_type, model in TITLED
+    )).subquery()
+    recent_items = (await db.execute(
+        select(newest).order_by(newest.c.created_at.desc(), newest.c.id.desc()).limit(recent)
+    )).all()
+
+    weekly = [0] * 7  # items created in the last 7 days by UTC weekday, Sunday first
+    created = union_all(*(
+        select(model.created_at).filter(model.user_id == user_id, model.created_at >= now - timedelta(days=7))
+        for _, model in TITLED
+    ))
+    for (created_at,) in await db.execute(created):
+        weekly[(created_at.weekday() + 1) % 7] += 1
+
+    subjects = union_all(*(
+        select(model.subject.label("subject")).filter(model.user_id == user_id, model.subject.isnot(None), model.subject != "")
+        for model in WITH_SUBJECT
+    )).subquery()
+    popular = (await db.execute(
+        select(subjects.c.subject, func.count().label("count"))
+        .group_by(subjects.c.subject)
+        .order_by(func.count().desc(), subjects.c.subject)
+        .limit(POPULAR_SUBJECTS)
+    )).all()
+
+    counts = {key: totals[key] for _, key, _ in ITEM_TYPES}
+    total_titled = sum(counts[key] for item_type, key, _ in ITEM_TYPES if item_type != "resource")
+    created_this_month = sum(totals[f"{item_type}_30d"] for item_type, _ in TITLED)
+    return {
+        "counts": counts,
+        "recent": [
+            {"type": item_type, "id": item_id, "title": title, "created_at": created_at}
+            for item_type, item_id, title, created_at in recent_items
+        ],
+        "weekly_activity": weekly,
+        "popular_subjects": [{"subject": subject, "count": count} for subject, count in popular],
+        "engagement_rate": round(created_this_month / total_titled * 100) if total_titled else 0,
+        "average_progress": round(totals["average_progress"] or 0),
+    }
+
+
+dashboard_cache = DashboardCache()
@@ -1,19 +1,235 @@
 # database.py
-from sqlalchemy import create_engine
+from sqlalchemy import JSON, create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ai_edumate.db")
+# The request path uses an asyncio driver for the same database; defaults to the
+# DATABASE_URL with its driver swapped (sqlite -> aiosqlite, postgresql -> asyncpg)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}
+
+# SQLite profile: WAL lets readers run alongside the single writer, and the busy
+# timeout makes a second writer wait for the lock instead of failing at once
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+# "immediate" takes the write lock at BEGIN, so read-then-write transactions wait
+# on busy_timeout rather than failing when they upgrade; it also serializes reads
+SQLITE_BEGIN_MODE = os.getenv("SQLITE_BEGIN_MODE", "deferred").lower()
+
+# Server database profile (PostgreSQL, MySQL): per-process connection pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def apply_sqlite_pragmas(dbapi_connection, in_memory: bool = False):
+    """Tune a fresh SQLite connection for concurrent API workers"""
+    cursor = dbapi_connection.cursor()
+    if not in_memory:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def is_in_memory(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:"
+
+
+def configure_sqlite(engine, in_memory: bool = False):
+    """Install the SQLite pragmas (and optional BEGIN IMMEDIATE) on a sync engine"""
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, in_memory)
+        if SQLITE_BEGIN_MODE == "immediate":
+            # Let SQLAlchemy emit BEGIN itself instead of the driver's implicit one
+            dbapi_connection.isolation_level = None
+
+    if SQLITE_BEGIN_MODE == "immediate":
+        @event.listens_for(engine, "begin")
+        def on_begin(connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def create_sqlite_engine(url: str, **kwargs):
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        **kwargs
+    )
+    configure_sqlite(engine, is_in_memory(url))
+    return engine
+
+
+def server_pool_options() -> dict:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def create_server_engine(url: str, **kwargs):
+    return create_engine(url, poolclass=QueuePool, **server_pool_options(), **kwargs)
+
+
+def create_engine_for_url(url: str, **kwargs):
+    """Build an engine with the profile that matches the database URL"""
+    if is_sqlite(url):
+        return create_sqlite_engine(url, **kwargs)
+    return create_server_engine(url, **kwargs)
+
+
+def to_async_url(url: str) -> str:
+    """Swap the driver of a database URL for its asyncio counterpart"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for '{backend}'; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+def create_async_engine_for_url(url: str, **kwargs):
+    """Asyncio engine with the same profile as create_engine_for_url"""
+    if is_sqlite(url):
+        engine = create_async_engine(url, connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}, **kwargs)
+        configure_sqlite(engine.sync_engine, is_in_memory(url))
+        return engine
+    # The asyncio variant of QueuePool is the default here
+    return create_async_engine(url, **server_pool_options(), **kwargs)
+
+
+def ensure_indexes(metadata, bind) -> list:
+    """Create declared indexes missing on existing tables (create_all skips them)"""
+    created = []
+    inspector = inspect(bind)
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=bind)
+                created.append(index.name)
+    return created
+
+
+def ensure_columns(metadata, bind) -> list:
+    """Add declared columns missing on existing tables (create_all skips them).
+
+    Only suitable for nullable columns without defaults, which is how columns
+    added after release are declared; existing rows get NULL.
+    """
+    added = []
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=conn.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+                    added.append(f"{table.name}.{column.name}")
+    return added
+
+
+# One row per one-off data migration that has completed on this database
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+def applied_migrations(conn) -> set:
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (name VARCHAR(255) PRIMARY KEY)"))
+    return {name for (name,) in conn.execute(text(f"SELECT name FROM {MIGRATIONS_TABLE}"))}
+
+
+def json_columns(metadata):
+    for table in metadata.sorted_tables:
+        for column in table.columns:
+            # SQLAlchemy 1.4 wraps with_variant() types in a Variant around .impl
+            if isinstance(getattr(column.type, "impl", column.type), JSON):
+                yield table, column
+
+
+def migrate_json_columns(metadata, bind) -> list:
+    """Bring columns that used to hold json.dumps text in line with their JSON type.
+
+    SQLite keeps the same storage, so only values that are not valid JSON (plain
+    text written by older clients) are quoted into JSON strings; each column is
+    scanned once and then recorded in MIGRATIONS_TABLE. PostgreSQL columns still
+    typed text/varchar are converted to JSONB in place.
+    """
+    migrated = []
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        applied = applied_migrations(conn) if conn.dialect.name == "sqlite" else set()
+        for table, column in json_columns(metadata):
+            if not inspector.has_table(table.name):
+                continue
+            if conn.dialect.name == "sqlite":
+                name = f"json_quote:{table.name}.{column.name}"
+                if name in applied:
+                    continue
+                result = conn.execute(text(
+                    f'UPDATE {table.name} SET "{column.name}" = json_quote("{column.name}") '
+                    f'WHERE "{column.name}" IS NOT NULL AND json_valid("{column.name}") = 0'
+                ))
+                # OR IGNORE: another worker starting at the same time may have recorded it
+                conn.execute(text(f"INSERT OR IGNORE INTO {MIGRATIONS_TABLE} (name) VALUES (:name)"), {"name": name})
+                if result.rowcount:
+                    migrated.append(f"{table.name}.{column.name} ({result.rowcount} rows quoted)")
+            elif conn.dialect.name == "postgresql":
+                current = {c["name"]: c["type"] for c in inspector.get_columns(table.name)}
+                if not isinstance(current.get(column.name), JSON):
+                    conn.execute(text(
+                        f'ALTER TABLE {table.name} ALTER COLUMN "{column.name}" TYPE JSONB '
+                        f'USING NULLIF("{column.name}", \'\')::jsonb'
+                    ))
+                    migrated.append(f"{table.name}.{column.name} (converted to JSONB)")
+    return migrated
+
+
+def pool_status() -> dict:
+    status = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        status[name] = {"pool": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            status[name].update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    status["backend"] = engine.dialect.name
+    return status
+
 
 # Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}  # Only needed for SQLite
-)
+engine = create_engine_for_url(DATABASE_URL)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Asyncio engine and sessions for request handlers; instances stay readable after commit
+async_engine = create_async_engine_for_url(ASYNC_DATABASE_URL or to_async_url(DATABASE_URL))
+AsyncSessionLocal = sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Create base class for models
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
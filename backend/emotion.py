@@ -0,0 +1,603 @@
+# emotion.py
+import asyncio
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+EMOTION_MODEL = os.getenv("EMOTION_MODEL", "bhadresh-savani/distilbert-base-uncased-emotion")
+
+# Inference backend: "torch" (fp32), "torch-int8" (dynamically quantized Linear layers)
+# or "onnx" (exported once to EMOTION_ONNX_DIR and run with onnxruntime via optimum)
+EMOTION_BACKEND = os.getenv("EMOTION_BACKEND", "torch")
+EMOTION_ONNX_DIR = os.getenv("EMOTION_ONNX_DIR", "./models/emotion-onnx")
+
+# Long inputs: anything over EMOTION_MAX_CHARS is cut to its head and tail before any
+# work is done; what still exceeds the model's token limit is classified as overlapping
+# windows of EMOTION_WINDOW_TOKENS and the window scores are averaged by token count
+EMOTION_MAX_CHARS = int(os.getenv("EMOTION_MAX_CHARS", "4000"))
+EMOTION_WINDOW_TOKENS = int(os.getenv("EMOTION_WINDOW_TOKENS", "256"))
+EMOTION_WINDOW_OVERLAP = int(os.getenv("EMOTION_WINDOW_OVERLAP", "32"))
+
+# Micro-batching of concurrent classifications: largest batch and how long the first
+# request in a batch may wait for company
+EMOTION_BATCHING = os.getenv("EMOTION_BATCHING", "1") == "1"
+EMOTION_BATCH_SIZE = int(os.getenv("EMOTION_BATCH_SIZE", "16"))
+EMOTION_BATCH_WAIT_MS = float(os.getenv("EMOTION_BATCH_WAIT_MS", "2"))
+
+# "local" runs the model in this process; "sidecar" asks the shared emotion_worker.py
+# process over a Unix socket and falls back to the lexicon when it does not answer in time
+EMOTION_MODE = os.getenv("EMOTION_MODE", "local")
+EMOTION_SIDECAR_SOCKET = os.getenv("EMOTION_SIDECAR_SOCKET", "/tmp/ai-edumate-emotion.sock")
+EMOTION_SIDECAR_TIMEOUT = float(os.getenv("EMOTION_SIDECAR_TIMEOUT", "1.0"))
+
+# Cascade: answer from a normalized-text cache, trivial replies or the lexicon when it is
+# confident enough, and run the model only for the rest
+EMOTION_CASCADE = os.getenv("EMOTION_CASCADE", "0") == "1"
+EMOTION_CASCADE_THRESHOLD = float(os.getenv("EMOTION_CASCADE_THRESHOLD", "0.6"))
+EMOTION_CACHE_SIZE = int(os.getenv("EMOTION_CACHE_SIZE", "4096"))
+
+
+def _build_torch(model_name: str):
+    from transformers import pipeline
+    return pipeline("text-classification", model=model_name)
+
+
+def _build_torch_int8(model_name: str):
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline("text-classification", model=model, tokenizer=AutoTokenizer.from_pretrained(model_name))
+
+
+def _build_onnx(model_name: str):
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoConfig, AutoTokenizer, pipeline
+    if os.path.isdir(EMOTION_ONNX_DIR):
+        model = ORTModelForSequenceClassification.from_pretrained(EMOTION_ONNX_DIR)
+        # A stale export of another model would silently change the label set
+        expected = AutoConfig.from_pretrained(model_name).id2label
+        if {int(k): v for k, v in model.config.id2label.items()} != {int(k): v for k, v in expected.items()}:
+            raise ValueError(f"ONNX export in {EMOTION_ONNX_DIR} does not match {model_name}; delete it to re-export")
+        tokenizer = AutoTokenizer.from_pretrained(EMOTION_ONNX_DIR)
+    else:
+        model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model.save_pretrained(EMOTION_ONNX_DIR)
+        tokenizer.save_pretrained(EMOTION_ONNX_DIR)
+    return pipeline("text-classification", model=model, tokenizer=tokenizer)
+
+
+# Every backend wraps the same checkpoint, so labels match what analyze_emotion expects
+BACKENDS = {
+    "torch": _build_torch,
+    "torch-int8": _build_torch_int8,
+    "onnx": _build_onnx,
+}
+
+
+def cap_text(text: str, max_chars: int = None) -> str:
+    """Bound the input size: keep the head and tail, where students usually say how they feel"""
+    max_chars = max_chars or EMOTION_MAX_CHARS
+    if len(text) <= max_chars:
+        return text
+    half = max_chars // 2
+    return text[:half] + " ... " + text[-half:]
+
+
+class EmotionClassifier:
+    """Process-wide emotion classifier, loaded on first use.
+
+    ``transformers`` is only imported when the model is first needed, and the
+    pipeline is built once per process behind a lock, so workers that never
+    serve tutor chat never pay for it. ``warm_up()`` loads it ahead of time
+    and ``status()`` reports readiness.
+    """
+
+    def __init__(self, model_name: str = None, backend: str = None):
+        self.model_name = model_name or EMOTION_MODEL
+        self.backend = backend or EMOTION_BACKEND
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown EMOTION_BACKEND '{self.backend}'")
+        self.state = "cold"  # cold, loading, ready, failed
+        self.error = None
+        self.load_seconds = None
+        self._pipeline = None
+        self._lock = threading.Lock()
+        self.counters = {"capped": 0, "chunked": 0, "windows": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self._pipeline is not None
+
+    def load(self):
+        if self._pipeline is not None:
+            return self._pipeline
+        with self._lock:
+            if self._pipeline is None:
+                self.state = "loading"
+                started = time.perf_counter()
+                try:
+                    self._pipeline = BACKENDS[self.backend](self.model_name)
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    raise
+                self.load_seconds = time.perf_counter() - started
+                self.state = "ready"
+                self.error = None
+        return self._pipeline
+
+    def __call__(self, text):
+        return self.classify_batch([text])
+
+    def _windows(self, tokenizer, text):
+        """Split ``text`` into pieces within the model's token limit; returns (pieces, weights)"""
+        limit = min(getattr(tokenizer, "model_max_length", 512), 512) - 2 if tokenizer else 510
+        # A WordPiece token covers at least one character, so short texts skip tokenizing
+        if tokenizer is None or len(text) <= limit:
+            return [text], [1]
+        ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+        if len(ids) <= limit:
+            return [text], [1]
+
+        size = min(EMOTION_WINDOW_TOKENS, limit)
+        step = max(1, size - EMOTION_WINDOW_OVERLAP)
+        windows = []
+        for start in range(0, len(ids), step):
+            windows.append(ids[start:start + size])
+            if start + size >= len(ids):
+                break
+        self.counters["chunked"] += 1
+        self.counters["windows"] += len(windows)
+        return [tokenizer.decode(w) for w in windows], [len(w) for w in windows]
+
+    def classify_batch(self, texts):
+        """Top label and score for each text, run as one padded forward pass.
+
+        Texts longer than the model's token limit are classified as several
+        windows in the same batch; a text's label is the one with the highest
+        token-weighted mean score across its windows.
+        """
+        pipe = self.load()
+        tokenizer = getattr(pipe, "tokenizer", None)
+        pieces, owners, weights = [], [], []
+        for index, text in enumerate(texts):
+            if len(text) > EMOTION_MAX_CHARS:
+                self.counters["capped"] += 1
+                text = cap_text(text)
+            text_pieces, text_weights = self._windows(tokenizer, text)
+            pieces += text_pieces
+            weights += text_weights
+            owners += [index] * len(text_pieces)
+
+        # truncation guards tokenizers where a character can become several tokens
+        outputs = pipe(pieces, batch_size=len(pieces), truncation=True, top_k=None)
+
+        totals = [{} for _ in texts]
+        weight_sums = [0] * len(texts)
+        for owner, weight, scores in zip(owners, weights, outputs):
+            for score in scores:
+                totals[owner][score["label"]] = totals[owner].get(score["label"], 0.0) + weight * score["score"]
+            weight_sums[owner] += weight
+        results = []
+        for label_scores, weight_sum in zip(totals, weight_sums):
+            label = max(label_scores, key=label_scores.get)
+            results.append({"label": label, "score": label_scores[label] / weight_sum})
+        return results
+
+    async def ensure_loaded(self):
+        """Load the model in a worker thread so the event loop keeps serving requests"""
+        if self._pipeline is None:
+            await asyncio.to_thread(self.load)
+
+    async def warm_up(self):
+        """Load the model and run one inference so the first request is not the slow one"""
+        await self.ensure_loaded()
+        await asyncio.to_thread(self, "warm up")
+        await asyncio.to_thread(sentiment_polarity, "warm up")
+
+    def status(self):
+        return {
+            "model": self.model_name,
+            "backend": self.backend,
+            "state": self.state,
+            "load_seconds": self.load_seconds,
+            **self.counters,
+            "error": self.error,
+        }
+
+
+class EmotionBatcher:
+    """Collects concurrent classification calls into batches.
+
+    A single consumer task takes the first queued text, waits up to
+    ``max_wait_ms`` (or until ``max_batch`` texts are queued), then runs the
+    whole batch in a worker thread and resolves each caller's future. While a
+    batch runs, new calls queue up and form the next one.
+    """
+
+    def __init__(self, classifier, max_batch: int = None, max_wait_ms: float = None):
+        self.classifier = classifier
+        self.max_batch = max_batch or EMOTION_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else EMOTION_BATCH_WAIT_MS) / 1000
+        self._queue = None
+        self._worker = None
+        self.counters = {"batches": 0, "items": 0, "max_batch_seen": 0}
+
+    async def classify(self, text: str):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Skip callers that gave up while waiting
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                results = await asyncio.to_thread(self.classifier.classify_batch, [text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            self.counters["batches"] += 1
+            self.counters["items"] += len(batch)
+            self.counters["max_batch_seen"] = max(self.counters["max_batch_seen"], len(batch))
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self):
+        batches = self.counters["batches"]
+        return {
+            **self.counters,
+            "enabled": EMOTION_BATCHING,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "avg_batch": self.counters["items"] / batches if batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+def sentiment_polarity(text: str) -> float:
+    """TextBlob polarity in [-1, 1]; TextBlob (and NLTK) are imported on first use.
+
+    Blocking: async callers run it with asyncio.to_thread.
+    """
+    from textblob import TextBlob
+    return TextBlob(cap_text(text)).sentiment.polarity
+
+
+# ----- Lexicon -----
+
+# Cue words and phrases for the tutor's prompt styles; needs no model or corpora
+LEXICON = {
+    "stressed": (
+        "stuck", "confused", "confusing", "don't understand", "dont understand", "don't get",
+        "dont get", "hard", "difficult", "frustrated", "frustrating", "worried", "anxious",
+        "stressed", "lost", "panic", "overwhelmed", "scared", "fail", "failing", "hate", "help",
+    ),
+    "confident": (
+        "easy", "got it", "makes sense", "understand now", "figured", "confident", "i know",
+        "nailed", "ready", "too easy", "harder", "challenge",
+    ),
+    "curious": (
+        "why", "how does", "how do", "what if", "wonder", "curious", "interesting",
+        "tell me more", "cool", "what happens",
+    ),
+    "disengaged": (
+        "boring", "bored", "whatever", "don't care", "dont care", "tired", "sleepy", "meh",
+        "pointless", "when does class end",
+    ),
+}
+
+_LEXICON_PATTERNS = {
+    label: re.compile(r"\b(?:" + "|".join(re.escape(cue) for cue in cues) + r")\b")
+    for label, cues in LEXICON.items()
+}
+
+
+def lexicon_scores(text: str):
+    """Return (label, confidence) from cue-word hits; confidence is 0 without any hit"""
+    normalized = text.casefold().replace("\u2019", "'")
+    hits = {label: len(pattern.findall(normalized)) for label, pattern in _LEXICON_PATTERNS.items()}
+    total = sum(hits.values())
+    if not total:
+        return "neutral", 0.0
+    label = max(hits, key=hits.get)
+    # Agreement among hits, discounted for a single weak cue
+    return label, hits[label] / (total + 1)
+
+
+def lexicon_emotion(text: str) -> str:
+    return lexicon_scores(text)[0]
+
+
+# ----- Detection -----
+
+# The tutor's prompt styles; every detection path answers with one of these
+TUTOR_EMOTIONS = ("stressed", "confident", "curious", "disengaged", "neutral")
+
+# Labels of the default checkpoint mapped onto the tutor's vocabulary; labels of
+# other checkpoints that are not tutor emotions themselves count as neutral
+MODEL_LABELS = {
+    "sadness": "stressed",
+    "fear": "stressed",
+    "anger": "stressed",
+    "joy": "confident",
+    "love": "confident",
+    "surprise": "curious",
+}
+
+
+def tutor_emotion(label: str) -> str:
+    label = label.lower()
+    return label if label in TUTOR_EMOTIONS else MODEL_LABELS.get(label, "neutral")
+
+
+def decide_emotion(transformer_result, polarity: float) -> str:
+    """Combine the transformer's top label with TextBlob polarity into a tutor emotion"""
+    if transformer_result['score'] > 0.6:
+        return transformer_result['label'].lower()
+    elif polarity < -0.3:
+        return "stressed"
+    elif polarity > 0.3:
+        return "confident"
+    else:
+        return "neutral"
+
+
+async def detect_emotion_local(text: str) -> str:
+    # A cold process loads the model in a thread without blocking the event loop
+    await emotion_classifier.ensure_loaded()
+    transformer_result = await classify_emotion(text)
+    polarity = await asyncio.to_thread(sentiment_polarity, text)
+    return decide_emotion(transformer_result, polarity)
+
+
+class EmotionSidecarError(Exception):
+    """Raised when the emotion worker process reports an error"""
+
+
+class EmotionSidecarClient:
+    """Client for emotion_worker.py over one multiplexed Unix socket connection.
+
+    Requests and responses are JSON lines tagged with an id, so concurrent
+    callers share the connection; the worker batches them together.
+    """
+
+    def __init__(self, path: str = None, timeout: float = None):
+        self.path = path or EMOTION_SIDECAR_SOCKET
+        self.timeout = timeout or EMOTION_SIDECAR_TIMEOUT
+        self._writer = None
+        self._reader_task = None
+        self._pending = {}
+        self._ids = itertools.count()
+        self._connect_lock = None
+        self.degraded = False
+        self.counters = {"requests": 0, "timeouts": 0, "errors": 0, "fallbacks": 0}
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def _connect(self):
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self.connected:
+                return
+            reader, self._writer = await asyncio.open_unix_connection(self.path)
+            self._reader_task = asyncio.create_task(self._read_responses(reader))
+
+    async def _read_responses(self, reader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._pending.pop(response.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(EmotionSidecarError(response["error"]))
+                else:
+                    future.set_result(response["emotion"])
+        except (OSError, ValueError):
+            pass
+        finally:
+            # The worker went away: fail everything still waiting and reconnect next time
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("emotion worker disconnected"))
+            self._pending.clear()
+
+    async def detect(self, text: str) -> str:
+        self.counters["requests"] += 1
+        await asyncio.wait_for(self._connect(), self.timeout)
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(json.dumps({"id": request_id, "text": text}).encode() + b"\n")
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+
+    def stats(self):
+        return {**self.counters, "socket": self.path, "connected": self.connected, "degraded": self.degraded}
+
+
+# Shared by every request in this process
+emotion_classifier = EmotionClassifier()
+emotion_batcher = EmotionBatcher(emotion_classifier)
+
+
+emotion_sidecar = EmotionSidecarClient()
+
+
+async def classify_emotion(text: str):
+    """Top emotion label and score for ``text``, computed off the event loop and
+    batched with concurrent callers when ``EMOTION_BATCHING`` is on"""
+    if EMOTION_BATCHING:
+        return await emotion_batcher.classify(text)
+    return (await asyncio.to_thread(emotion_classifier, text))[0]
+
+
+# ----- Cascade -----
+
+# Replies that carry no emotional signal worth a forward pass
+TRIVIAL_MESSAGES = {
+    "ok", "okay", "k", "kk", "thanks", "thank you", "thx", "ty", "yes", "yeah", "yep",
+    "no", "nope", "sure", "hi", "hello", "hey", "bye", "goodbye", "alright", "fine",
+}
+
+CASCADE_STAGES = ("cache", "trivial", "lexicon", "model")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+class EmotionCascade:
+    """Resolves each message with the cheapest stage that is confident enough.
+
+    Stages run in order: LRU cache of normalized texts, trivial replies, the
+    cue-word lexicon and finally the model, whose answer already weighs
+    TextBlob polarity (so polarity never overrides a confident model label).
+    ``counters`` records which stage answered each request.
+    """
+
+    def __init__(self, threshold: float = None, cache_size: int = None):
+        self.threshold = threshold if threshold is not None else EMOTION_CASCADE_THRESHOLD
+        self.cache_size = cache_size or EMOTION_CACHE_SIZE
+        self._cache = OrderedDict()
+        self.counters = {stage: 0 for stage in CASCADE_STAGES}
+
+    async def resolve(self, text: str, key: str = None):
+        """Return (emotion, stage) without consulting or filling the cache"""
+        key = key if key is not None else normalize_text(text)
+        if key.strip(" .!?") in TRIVIAL_MESSAGES:
+            return "neutral", "trivial"
+
+        label, confidence = lexicon_scores(text)
+        if confidence >= self.threshold:
+            return label, "lexicon"
+
+        return await detect_emotion_model(text), "model"
+
+    async def detect(self, text: str) -> str:
+        key = normalize_text(text)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.counters["cache"] += 1
+            return cached
+
+        emotion, stage = await self.resolve(text, key)
+        self.counters[stage] += 1
+        # Lexicon fallbacks during a sidecar outage must not outlive the outage
+        if not emotion_sidecar.degraded:
+            self._cache[key] = emotion
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return emotion
+
+    def stats(self):
+        total = sum(self.counters.values())
+        return {
+            "enabled": EMOTION_CASCADE,
+            "threshold": self.threshold,
+            "cache_entries": len(self._cache),
+            "resolved": dict(self.counters),
+            "resolved_ratio": {
+                stage: count / total if total else 0.0 for stage, count in self.counters.items()
+            },
+        }
+
+
+emotion_cascade = EmotionCascade()
+
+
+async def detect_emotion(text: str) -> str:
+    """Tutor emotion for ``text``: through the cascade when enabled, else always the model.
+
+    Every stage's answer goes through tutor_emotion(), so the prompt style does
+    not depend on which stage answered.
+    """
+    # Bounds the lexicon, polarity, cache keys and sidecar payloads as well as the model
+    if len(text) > EMOTION_MAX_CHARS:
+        emotion_classifier.counters["capped"] += 1
+        text = cap_text(text)
+    if EMOTION_CASCADE:
+        return tutor_emotion(await emotion_cascade.detect(text))
+    return tutor_emotion(await detect_emotion_model(text))
+
+
+async def detect_emotion_model(text: str) -> str:
+    """Emotion from the model in this process or the shared worker"""
+    if EMOTION_MODE != "sidecar":
+        return await detect_emotion_local(text)
+    try:
+        emotion = await emotion_sidecar.detect(text)
+    except (OSError, asyncio.TimeoutError, EmotionSidecarError) as e:
+        if isinstance(e, asyncio.TimeoutError):
+            emotion_sidecar.counters["timeouts"] += 1
+        else:
+            emotion_sidecar.counters["errors"] += 1
+        emotion_sidecar.counters["fallbacks"] += 1
+        if not emotion_sidecar.degraded:
+            emotion_sidecar.degraded = True
+            print(f"Emotion worker unavailable ({type(e).__name__}: {e}); falling back to the lexicon")
+        return lexicon_emotion(text)
+    if emotion_sidecar.degraded:
+        emotion_sidecar.degraded = False
+        print("Emotion worker reachable again")
+    return emotion
@@ -0,0 +1,86 @@
+# emotion_worker.py
+"""Shared emotion inference process.
+
+One process owns the DistilBERT model and the TextBlob corpora and answers
+every API worker over a Unix socket, so per-worker memory no longer grows with
+the model. Requests from all connections are micro-batched together.
+
+    python emotion_worker.py [--socket /tmp/ai-edumate-emotion.sock]
+    EMOTION_MODE=sidecar uvicorn main:app --workers 4
+
+Protocol: one JSON object per line, ``{"id": 1, "text": "..."}`` answered by
+``{"id": 1, "emotion": "stressed"}`` or ``{"id": 1, "error": "..."}``.
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from emotion import EMOTION_SIDECAR_SOCKET, emotion_batcher, emotion_classifier, detect_emotion_local  # noqa: E402
+
+
+async def answer(request, writer):
+    try:
+        response = {"id": request["id"], "emotion": await detect_emotion_local(request["text"])}
+    except Exception as e:
+        response = {"id": request.get("id"), "error": str(e)}
+    if not writer.is_closing():
+        writer.write(json.dumps(response).encode() + b"\n")
+
+
+async def handle_connection(reader, writer):
+    tasks = set()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+            except ValueError:
+                continue
+            # Answer concurrently so requests on one connection share batches
+            task = asyncio.create_task(answer(request, writer))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        for task in tasks:
+            task.cancel()
+        writer.close()
+
+
+async def serve(path: str):
+    print(f"Loading emotion model {emotion_classifier.model_name}")
+    await emotion_classifier.warm_up()
+    print(f"Model ready in {emotion_classifier.load_seconds:.1f}s")
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(handle_connection, path=path)
+    os.chmod(path, 0o660)
+    print(f"Serving emotion classification on {path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await emotion_batcher.stop()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared emotion inference worker")
+    parser.add_argument("--socket", default=EMOTION_SIDECAR_SOCKET)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
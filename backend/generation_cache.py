@@ -0,0 +1,160 @@
+# generation_cache.py
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import models
+from database import SessionLocal
+
+
+def normalize_parameters(value):
+    """Normalize request parameters so equivalent requests hash identically"""
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, dict):
+        return {str(k): normalize_parameters(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_parameters(v) for v in value]
+    return value
+
+
+def make_cache_key(tool_type: str, model: str, template_version, parameters) -> str:
+    payload = json.dumps(
+        {
+            "tool_type": tool_type,
+            "model": model,
+            "template_version": template_version,
+            "parameters": normalize_parameters(parameters or {}),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class GenerationCache:
+    """Two-tier cache for LLM generations: an in-memory LRU in front of a
+    persistent table with TTL. Expired entries are kept for a further stale
+    window so they can be served when generation fails. Values must be JSON
+    serializable."""
+
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None):
+        self.max_entries = max_entries or int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "512"))
+        self.ttl = timedelta(seconds=ttl_seconds or int(os.getenv("GENERATION_CACHE_TTL", str(7 * 24 * 3600))))
+        self.stale_ttl = timedelta(seconds=int(os.getenv("GENERATION_CACHE_STALE_TTL", str(30 * 24 * 3600))))
+        self.enabled = os.getenv("GENERATION_CACHE_ENABLED", "1") == "1"
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0, "bypassed": 0, "writes": 0}
+
+    # ----- Memory tier -----
+
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[1] + self.stale_ttl <= datetime.utcnow():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry
+
+    def _memory_set(self, key, value, expires_at):
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    # ----- Persistent tier -----
+
+    def _disk_get(self, key):
+        db = SessionLocal()
+        try:
+            entry = db.query(models.GenerationCacheEntry).filter(
+                models.GenerationCacheEntry.key == key
+            ).first()
+            # Expired rows are kept for stale serving until the periodic purge
+            if entry is None or entry.expires_at + self.stale_ttl <= datetime.utcnow():
+                return None
+            return json.loads(entry.value), entry.expires_at
+        finally:
+            db.close()
+
+    def _disk_set(self, key, tool_type, value, expires_at):
+        db = SessionLocal()
+        try:
+            db.merge(models.GenerationCacheEntry(
+                key=key,
+                tool_type=tool_type,
+                value=json.dumps(value),
+                expires_at=expires_at
+            ))
+            # Purge rows past the stale window every so often instead of on every write
+            self._writes += 1
+            if self._writes % 100 == 0:
+                db.query(models.GenerationCacheEntry).filter(
+                    models.GenerationCacheEntry.expires_at <= datetime.utcnow() - self.stale_ttl
+                ).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    # ----- Public API -----
+
+    async def get(self, key, allow_stale: bool = False):
+        """Return the cached value for ``key`` or None.
+
+        With ``allow_stale`` an expired entry is still returned for up to
+        ``GENERATION_CACHE_STALE_TTL`` seconds past its expiry; this is used
+        to degrade gracefully while the LLM upstream is failing.
+        """
+        if not self.enabled:
+            return None
+        entry = self._memory_get(key)
+        tier = "memory_hits"
+        if entry is None:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            tier = "disk_hits"
+            if entry is not None:
+                self._memory_set(key, *entry)
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        value, expires_at = entry
+        if expires_at <= datetime.utcnow():
+            if not allow_stale:
+                self.counters["misses"] += 1
+                return None
+            tier = "stale_hits"
+        self.counters[tier] += 1
+        return value
+
+    async def set(self, key, value, tool_type: str = None):
+        if not self.enabled:
+            return
+        expires_at = datetime.utcnow() + self.ttl
+        self._memory_set(key, value, expires_at)
+        await asyncio.to_thread(self._disk_set, key, tool_type, value, expires_at)
+        self.counters["writes"] += 1
+
+    def record_bypass(self):
+        self.counters["bypassed"] += 1
+
+    def stats(self):
+        lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        return {
+            **self.counters,
+            "memory_entries": len(self._memory),
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+
+generation_cache = GenerationCache()
@@ -0,0 +1,208 @@
+# jobs.py
+import asyncio
+import json
+import os
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+import models
+from database import SessionLocal
+
+
+class LocalJobExecutor:
+    """Runs background generation jobs on a bounded in-process worker pool.
+
+    Jobs are stored in the ``generation_jobs`` table, so queued work and jobs
+    interrupted by a restart are picked up again. Running jobs refresh their
+    ``updated_at`` every JOB_HEARTBEAT_SECONDS; a periodic sweep requeues
+    running jobs whose heartbeat is older than JOB_STALE_SECONDS, whichever
+    worker owned them, and fails those already claimed JOB_MAX_ATTEMPTS times. A job is claimed with a conditional UPDATE so that
+    several API workers sharing the database never run the same job twice.
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "2"))
+        self.heartbeat = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+        self.stale_after = timedelta(seconds=int(os.getenv("JOB_STALE_SECONDS", "120")))
+        self.max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self._handlers = {}
+        self._queue = None
+        self._tasks = []
+        self._waiting = set()  # ids in the local queue
+        self._running = set()  # ids claimed by this process
+
+    def register(self, job_type: str, handler):
+        """Register ``async handler(payload, user_id) -> result_id`` for a job type"""
+        self._handlers[job_type] = handler
+
+    async def submit(self, job_type: str, payload: dict, user_id: int):
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type '{job_type}'")
+        job = await asyncio.to_thread(self._create, job_type, payload, user_id)
+        if self._queue is not None:
+            self._enqueue(job.id)
+        return job
+
+    def _create(self, job_type, payload, user_id):
+        db = SessionLocal()
+        try:
+            job = models.GenerationJob(
+                id=uuid.uuid4().hex,
+                job_type=job_type,
+                status="queued",
+                payload=json.dumps(payload),
+                attempts=0,
+                user_id=user_id
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            return job
+        finally:
+            db.close()
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        for job_id in await asyncio.to_thread(self._recover):
+            self._enqueue(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _enqueue(self, job_id):
+        if job_id not in self._waiting and job_id not in self._running:
+            self._waiting.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def _maintain(self):
+        """Heartbeat this process's running jobs and requeue jobs orphaned elsewhere"""
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            try:
+                if self._running:
+                    await asyncio.to_thread(self._touch, list(self._running))
+                for job_id in await asyncio.to_thread(self._recover):
+                    self._enqueue(job_id)
+            except Exception:
+                traceback.print_exc()
+
+    def _touch(self, job_ids):
+        db = SessionLocal()
+        try:
+            db.query(models.GenerationJob).filter(
+                models.GenerationJob.id.in_(job_ids),
+                models.GenerationJob.status == "running"
+            ).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _recover(self):
+        """Requeue jobs left running by a dead worker and return all queued ids.
+
+        A stale job out of attempts is failed instead: one that crashes or hangs
+        its worker would otherwise be paid for again on every sweep.
+        """
+        db = SessionLocal()
+        try:
+            stale = (
+                models.GenerationJob.status == "running",
+                models.GenerationJob.updated_at < datetime.utcnow() - self.stale_after
+            )
+            db.query(models.GenerationJob).filter(
+                *stale, models.GenerationJob.attempts >= self.max_attempts
+            ).update({
+                "status": "failed",
+                "error": f"Worker stopped responding on all {self.max_attempts} attempts",
+                "updated_at": datetime.utcnow()
+            }, synchronize_session=False)
+            db.query(models.GenerationJob).filter(*stale).update({"status": "queued"}, synchronize_session=False)
+            db.commit()
+            queued = db.query(models.GenerationJob.id).filter(
+                models.GenerationJob.status == "queued"
+            ).order_by(models.GenerationJob.created_at).all()
+            return [job_id for (job_id,) in queued]
+        finally:
+            db.close()
+
+    def _claim(self, job_id):
+        db = SessionLocal()
+        try:
+            claimed = db.query(models.GenerationJob).filter(
+                models.GenerationJob.id == job_id,
+                models.GenerationJob.status == "queued"
+            ).update({
+                "status": "running",
+                "attempts": models.GenerationJob.attempts + 1,
+                "updated_at": datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                return None
+            job = db.query(models.GenerationJob).filter(models.GenerationJob.id == job_id).first()
+            return job.job_type, json.loads(job.payload), job.user_id
+        finally:
+            db.close()
+
+    def _finish(self, job_id, status, result_id=None, error=None):
+        db = SessionLocal()
+        try:
+            db.query(models.GenerationJob).filter(
+                models.GenerationJob.id == job_id
+            ).update({
+                "status": status,
+                "result_id": result_id,
+                "error": error,
+                "updated_at": datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._waiting.discard(job_id)
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id):
+        claimed = await asyncio.to_thread(self._claim, job_id)
+        if claimed is None:
+            return
+        job_type, payload, user_id = claimed
+        self._running.add(job_id)
+        try:
+            result_id = await self._handlers[job_type](payload, user_id)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back so the next start picks it up
+            await asyncio.to_thread(self._finish, job_id, "queued")
+            raise
+        except Exception as e:
+            traceback.print_exc()
+            await asyncio.to_thread(self._finish, job_id, "failed", None, str(e))
+        else:
+            await asyncio.to_thread(self._finish, job_id, "succeeded", result_id)
+        finally:
+            self._running.discard(job_id)
+
+
+def get_job_executor():
+    """Return the configured job backend; only the local executor ships today"""
+    backend = os.getenv("JOB_BACKEND", "local")
+    if backend != "local":
+        raise ValueError(f"Unsupported JOB_BACKEND '{backend}'")
+    return LocalJobExecutor()
+
+
+job_executor = get_job_executor()
@@ -0,0 +1,248 @@
+# json_stream.py
+import json
+import re
+
+# Characters that can change the parser state; everything else is skipped in bulk
+_STRUCTURAL = re.compile(r'[{}\[\]",:\\`]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+FENCE = "```"
+
+
+class _Frame:
+    __slots__ = ("kind", "start", "complete", "expect_key", "key")
+
+    def __init__(self, kind, start):
+        self.kind = kind          # "{" or "["
+        self.start = start        # index of the opening bracket
+        self.complete = None      # index just after the last complete element
+        self.expect_key = kind == "{"
+        self.key = None
+
+
+class IncrementalJSONParser:
+    """Tolerant single-pass JSON parser for LLM completions.
+
+    Text is consumed chunk by chunk with ``feed``. Anything before the first
+    ``{`` and after the matching ``}`` (code fences, prose) is ignored. When a
+    code fence follows a brace in the prose, parsing restarts inside the
+    fence. Every
+    element of the top-level ``collect_key`` array is decoded as soon as it
+    closes and returned from ``feed``; all of them accumulate in ``items``.
+    ``result`` returns the document, closing any arrays/objects left open by
+    a truncated completion after the last complete element.
+    """
+
+    def __init__(self, collect_key: str = "modules"):
+        self.collect_key = collect_key
+        self.text = ""
+        self.items = []
+        self._pos = 0
+        self._root_start = None
+        self._root_end = None
+        self._stack = []
+        self._in_string = False
+        self._string_start = None
+        self._collect_depth = None
+        self._collect_done = False
+        self._document = None
+
+    def _restart(self, pos):
+        """Discard a root that turned out to be prose; scan again from pos"""
+        self.items = []
+        self._pos = pos
+        self._root_start = None
+        self._root_end = None
+        self._stack = []
+        self._in_string = False
+        self._collect_depth = None
+        self._collect_done = False
+        self._document = None
+
+    def _find_root(self, text, pos):
+        """Index of the document's opening brace, skipping a code fence before it.
+
+        Returns None (with ``_pos`` set to resume from) when it has not arrived yet.
+        """
+        search_from = pos
+        fence = text.find(FENCE, pos)
+        brace = text.find("{", pos)
+        if fence != -1 and (brace == -1 or fence < brace):
+            line_end = text.find("\n", fence + len(FENCE))
+            if line_end == -1:
+                self._pos = fence  # the fence's info string is still arriving
+                return None
+            search_from = line_end + 1
+            brace = text.find("{", search_from)
+        if brace == -1:
+            # Keep a possibly partial fence at the end for the next chunk
+            self._pos = max(search_from, len(text) - len(FENCE) + 1)
+            return None
+        return brace
+
+    @property
+    def complete(self) -> bool:
+        return self._root_end is not None
+
+    def feed(self, chunk: str):
+        """Consume the next chunk and return the collected items it completed"""
+        # Drop the attribute's reference first so CPython can append in place
+        text = self.text
+        self.text = None
+        text += chunk
+        self.text = text
+        length = len(text)
+        pos = self._pos
+        completed = []
+
+        if self._root_end is not None:
+            if self._document is not None:
+                self._pos = length
+                return completed
+            # The braces found so far were prose; a later fence holds the document
+            fence = text.find(FENCE, max(pos - len(FENCE) + 1, self._root_end))
+            if fence == -1:
+                self._pos = length
+                return completed
+            self._restart(fence)
+            pos = fence
+
+        if self._root_start is None:
+            start = self._find_root(text, pos)
+            if start is None:
+                return completed
+            self._root_start = start
+            self._stack.append(_Frame("{", start))
+            pos = start + 1
+
+        stack = self._stack
+        while pos < length:
+            match = (_STRING_SPECIAL if self._in_string else _STRUCTURAL).search(text, pos)
+            if match is None:
+                pos = length
+                break
+            i = match.start()
+            ch = text[i]
+            pos = i + 1
+
+            if self._in_string:
+                if ch == "\\":
+                    # Skip the escaped character, which may not have arrived yet
+                    pos = i + 2
+                elif ch == '"':
+                    self._in_string = False
+                    frame = stack[-1]
+                    if frame.kind == "{" and frame.expect_key:
+                        frame.key = text[self._string_start + 1:i]
+                    else:
+                        frame.complete = i + 1
+                continue
+
+            frame = stack[-1]
+            if ch == "`":
+                if text.startswith(FENCE, i):
+                    # Backticks are not JSON: what was parsed so far was prose
+                    self._restart(i)
+                    return completed + self.feed("")
+                if length - i < len(FENCE) and FENCE.startswith(text[i:]):
+                    pos = i  # wait for the rest of a possible fence
+                    break
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":":
+                frame.expect_key = False
+            elif ch == ",":
+                frame.complete = i
+                if frame.kind == "{":
+                    frame.expect_key = True
+            elif ch == "{" or ch == "[":
+                stack.append(_Frame(ch, i))
+                if (ch == "[" and len(stack) == 2 and self.collect_key is not None
+                        and frame.key == self.collect_key and not self._collect_done):
+                    self._collect_depth = 2
+            elif ch == "}" or ch == "]":
+                closed = stack.pop()
+                if self._collect_depth is not None:
+                    if len(stack) == self._collect_depth:
+                        item = self._decode(text[closed.start:i + 1])
+                        if item is not None:
+                            self.items.append(item)
+                            completed.append(item)
+                    elif len(stack) == self._collect_depth - 1:
+                        self._collect_depth = None
+                        self._collect_done = True
+                if not stack:
+                    self._root_end = i + 1
+                    self._document = self._decode(text[self._root_start:i + 1])
+                    if self._document is None:
+                        # Keep scanning for a fenced document after the prose
+                        self._pos = i + 1
+                        return completed + self.feed("")
+                    pos = length
+                    break
+                stack[-1].complete = i + 1
+
+        self._pos = pos
+        return completed
+
+    @staticmethod
+    def _decode(fragment: str):
+        try:
+            # strict=False accepts raw newlines inside strings, a common LLM slip
+            return json.loads(fragment, strict=False)
+        except json.JSONDecodeError:
+            return None
+
+    def repaired_text(self):
+        """Return the document text with truncated trailing structures closed"""
+        if self._root_start is None:
+            return None
+        if self._root_end is not None:
+            return self.text[self._root_start:self._root_end]
+
+        innermost = self._stack[-1]
+        cut = innermost.complete if innermost.complete is not None else innermost.start + 1
+        closers = "".join("}" if frame.kind == "{" else "]" for frame in reversed(self._stack))
+        return self.text[self._root_start:cut] + closers
+
+    def result(self):
+        """Return the parsed (or repaired) document, or None if nothing usable was found"""
+        if self._document is not None:
+            return self._document
+        repaired = self.repaired_text()
+        if repaired is None:
+            return None
+        return self._decode(repaired)
+
+
+def fenced_body(text: str):
+    """Text inside the first code fence (to the last fence, or the end if unclosed)"""
+    fence = text.find(FENCE)
+    if fence == -1:
+        return None
+    line_end = text.find("\n", fence + len(FENCE))
+    if line_end == -1:
+        return None
+    close = text.rfind(FENCE)
+    return text[line_end + 1:close if close > line_end else len(text)]
+
+
+def parse_tolerant_json(text: str, collect_key: str = "modules"):
+    """Parse a complete completion in one go; returns (document, parser).
+
+    Well-formed documents are decoded directly; only malformed or truncated
+    ones pay for the incremental scan. ``parser`` is None on the fast path.
+    """
+    fenced = fenced_body(text)
+    for candidate in ((fenced, text) if fenced is not None else (text,)):
+        start, end = candidate.find("{"), candidate.rfind("}")
+        if start != -1 and end > start:
+            try:
+                return json.loads(candidate[start:end + 1], strict=False), None
+            except json.JSONDecodeError:
+                pass
+
+    parser = IncrementalJSONParser(collect_key)
+    parser.feed(text)
+    return parser.result(), parser
@@ -0,0 +1,214 @@
+# llm_client.py
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from llm_providers import LLMError, LLMQueueTimeoutError, LLMTimeoutError, get_provider
+from llm_governor import governor, estimate_cost, LANE_INTERACTIVE, LANE_BACKGROUND
+from llm_resilience import (
+    LLMUnavailableError, CircuitBreaker, LatencyTracker, is_retryable, backoff_delay
+)
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+
+class LLMClient:
+    """Single entry point for chat completions used by every generation endpoint.
+
+    The backend is chosen by ``LLM_PROVIDER`` (see llm_providers.py) and built
+    on first use so that values loaded by ``load_dotenv()`` are picked up.
+    Every attempt runs under a governor slot and a hard deadline; retryable
+    failures are retried with jittered backoff, slow attempts can be hedged
+    with a second request after the observed p95 latency, and a circuit
+    breaker fails fast while the upstream is unhealthy.
+    """
+
+    def __init__(self, provider=None):
+        self._provider = provider
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.counters = {"retries": 0, "timeouts": 0, "queue_timeouts": 0, "hedges": 0, "hedge_wins": 0}
+
+    @property
+    def provider(self):
+        if self._provider is None:
+            self._provider = get_provider()
+        return self._provider
+
+    @property
+    def default_timeout(self):
+        return float(os.getenv("LLM_TIMEOUT", "60"))
+
+    @property
+    def retries(self):
+        return int(os.getenv("LLM_RETRIES", "2"))
+
+    @property
+    def hedging_enabled(self):
+        return os.getenv("LLM_HEDGE", "0") == "1"
+
+    def is_configured(self) -> bool:
+        return self.provider.is_configured()
+
+    @asynccontextmanager
+    async def _slot(self, user_id, lane, cost, deadline_at):
+        """Hold a governor slot, waiting for it no longer than the call's deadline"""
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise LLMQueueTimeoutError("LLM call deadline exceeded")
+        try:
+            await asyncio.wait_for(governor.acquire(user_id, lane, cost), remaining)
+        except asyncio.TimeoutError:
+            self.counters["queue_timeouts"] += 1
+            raise LLMQueueTimeoutError(f"No LLM slot became free within the {remaining:.1f}s deadline")
+        try:
+            yield
+        finally:
+            governor.release()
+
+    async def _attempt(self, messages, model, timeout, user_id, lane, cost, operation, params, deadline_at):
+        self.breaker.before_call()
+        try:
+            async with self._slot(user_id, lane, cost, deadline_at):
+                started = time.monotonic()
+                timeout = min(timeout, deadline_at - started)
+                try:
+                    # The hard deadline also covers connections that trickle bytes forever
+                    content = await asyncio.wait_for(
+                        self.provider.chat(messages, model=model, timeout=timeout, **params),
+                        timeout
+                    )
+                except asyncio.TimeoutError:
+                    self.counters["timeouts"] += 1
+                    raise LLMTimeoutError(f"LLM call exceeded its {timeout:.1f}s deadline")
+        except LLMError as e:
+            if is_upstream_failure(e):
+                self.breaker.record_failure()
+            raise
+        finally:
+            self.breaker.abandon()
+
+        self.breaker.record_success()
+        self.latency.record(operation, time.monotonic() - started)
+        return content
+
+    async def _hedged_attempt(self, messages, model, timeout, user_id, lane, cost, params, deadline_at):
+        operation = (model, params.get("max_tokens"))
+        args = (messages, model, timeout, user_id, lane, cost, operation, params, deadline_at)
+        p95 = self.latency.percentile(operation, 0.95) if self.hedging_enabled else None
+        if p95 is None:
+            return await self._attempt(*args)
+
+        delay = max(p95, float(os.getenv("LLM_HEDGE_MIN_DELAY", "1")))
+        primary = asyncio.ensure_future(self._attempt(*args))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            self.counters["hedges"] += 1
+            backup = asyncio.ensure_future(self._attempt(*args))
+            pending.add(backup)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    # Keep the primary's error if the backup was only rejected by the breaker
+                    if error is None or not isinstance(task.exception(), LLMUnavailableError):
+                        error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def chat(self, messages, model: str = DEFAULT_MODEL, timeout: float = None,
+                   user_id=None, lane: str = LANE_BACKGROUND, deadline: float = None, **params) -> str:
+        """Run a chat completion and return the content of the first choice.
+
+        ``timeout`` bounds each attempt and ``deadline`` (default: enough for
+        every retry) bounds the whole call, including the time each attempt
+        waits for a governor slot in ``lane``, queued fairly against other
+        requests from ``user_id``.
+        """
+        timeout = timeout or self.default_timeout
+        retries = self.retries
+        deadline = deadline or float(os.getenv("LLM_DEADLINE", "0")) or timeout * (retries + 1)
+        deadline_at = time.monotonic() + deadline
+        cost = estimate_cost(messages, params)
+
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise LLMTimeoutError("LLM call deadline exceeded")
+            try:
+                return await self._hedged_attempt(
+                    messages, model, min(timeout, remaining), user_id, lane, cost, params, deadline_at
+                )
+            except LLMError as e:
+                delay = backoff_delay(attempt)
+                if attempt >= retries or not is_retryable(e) or time.monotonic() + delay >= deadline_at:
+                    raise
+                print(f"LLM call failed ({e}); retrying in {delay:.2f}s")
+                self.counters["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def stream_chat(self, messages, model: str = DEFAULT_MODEL, timeout: float = None,
+                          user_id=None, lane: str = LANE_BACKGROUND, deadline: float = None, **params):
+        """Yield content deltas of a streamed chat completion as they arrive.
+
+        Failures before the first delta are retried; once tokens have been
+        forwarded to the client an error is raised to the caller. ``deadline``
+        bounds the wait for a governor slot across all attempts.
+        """
+        timeout = timeout or self.default_timeout
+        deadline = deadline or float(os.getenv("LLM_DEADLINE", "0")) or timeout * (self.retries + 1)
+        deadline_at = time.monotonic() + deadline
+        cost = estimate_cost(messages, params)
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            received = False
+            try:
+                async with self._slot(user_id, lane, cost, deadline_at):
+                    async for delta in self.provider.stream_chat(
+                        messages, model=model, timeout=timeout, **params
+                    ):
+                        received = True
+                        yield delta
+                self.breaker.record_success()
+                return
+            except LLMError as e:
+                if is_upstream_failure(e):
+                    self.breaker.record_failure()
+                if received or attempt >= self.retries or not is_retryable(e) or time.monotonic() >= deadline_at:
+                    raise
+            finally:
+                self.breaker.abandon()
+
+            self.counters["retries"] += 1
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    def stats(self):
+        return {"circuit_breaker": self.breaker.stats(), **self.counters}
+
+    async def aclose(self):
+        if self._provider is not None:
+            await self._provider.aclose()
+
+
+def is_upstream_failure(error: LLMError) -> bool:
+    """Retryable errors that count against the circuit breaker; waiting for a slot does not"""
+    return is_retryable(error) and not isinstance(error, LLMQueueTimeoutError)
+
+
+# Shared client used by every generation endpoint
+llm_client = LLMClient()
@@ -0,0 +1,174 @@
+# llm_governor.py
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+LANE_INTERACTIVE = "interactive"
+LANE_BACKGROUND = "background"
+
+
+class _Waiter:
+    __slots__ = ("future", "lane", "cost", "start", "enqueued_at", "cancelled")
+
+    def __init__(self, future, lane, cost, start):
+        self.future = future
+        self.lane = lane
+        self.cost = cost
+        self.start = start
+        self.enqueued_at = time.monotonic()
+        self.cancelled = False
+
+
+class LLMGovernor:
+    """Global concurrency and token-rate limit in front of the LLM provider.
+
+    Waiting requests are ordered by start-time fair queuing over one flow per
+    (lane, user): each request's virtual finish tag advances its flow by
+    ``cost / lane weight``, so a user who queues many calls only delays their
+    own later calls, and the interactive lane (tutor chat) is served ahead of
+    the background lane (course/quiz generation) without starving it.
+    ``cost`` is the estimated token count, which also draws from a token
+    bucket when ``LLM_TOKENS_PER_MINUTE`` is set.
+    """
+
+    def __init__(self, max_concurrency: int = None, tokens_per_minute: int = None, lane_weights=None):
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.tokens_per_minute = tokens_per_minute or int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+        self.lane_weights = lane_weights or {
+            LANE_INTERACTIVE: float(os.getenv("LLM_INTERACTIVE_WEIGHT", "8")),
+            LANE_BACKGROUND: 1.0,
+        }
+        self._heap = []
+        self._seq = itertools.count()
+        self._flow_finish = {}
+        self._virtual_time = 0.0
+        self._in_flight = 0
+        self._tokens = float(self.tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._retry_handle = None
+        self._depth = {lane: 0 for lane in self.lane_weights}
+        self._waits = {lane: deque(maxlen=1000) for lane in self.lane_weights}
+        self._granted = {lane: 0 for lane in self.lane_weights}
+
+    # ----- Token bucket -----
+
+    def _refill(self):
+        if not self.tokens_per_minute:
+            return
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.tokens_per_minute),
+            self._tokens + (now - self._refilled_at) * self.tokens_per_minute / 60.0
+        )
+        self._refilled_at = now
+
+    def _affordable(self, cost):
+        if not self.tokens_per_minute:
+            return True
+        # A request larger than the whole bucket waits for a full bucket
+        return self._tokens >= min(cost, self.tokens_per_minute)
+
+    # ----- Scheduling -----
+
+    def _dispatch(self):
+        self._refill()
+        while self._heap and self._in_flight < self.max_concurrency:
+            _, _, waiter = self._heap[0]
+            if waiter.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            if not self._affordable(waiter.cost):
+                self._schedule_retry(waiter.cost)
+                return
+            heapq.heappop(self._heap)
+            self._virtual_time = max(self._virtual_time, waiter.start)
+            if self.tokens_per_minute:
+                self._tokens -= min(waiter.cost, self.tokens_per_minute)
+            self._in_flight += 1
+            self._depth[waiter.lane] -= 1
+            self._granted[waiter.lane] += 1
+            self._waits[waiter.lane].append(time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def _schedule_retry(self, cost):
+        if self._retry_handle is not None:
+            return
+        needed = min(cost, self.tokens_per_minute) - self._tokens
+        delay = max(needed * 60.0 / self.tokens_per_minute, 0.01)
+
+        def retry():
+            self._retry_handle = None
+            self._dispatch()
+
+        self._retry_handle = asyncio.get_running_loop().call_later(delay, retry)
+
+    async def acquire(self, user_id=None, lane: str = LANE_BACKGROUND, cost: int = 1000):
+        if lane not in self.lane_weights:
+            raise ValueError(f"Unknown lane '{lane}'")
+        flow = (lane, user_id)
+        if len(self._flow_finish) > 10000:
+            # Idle flows behind the virtual clock carry no state worth keeping
+            self._flow_finish = {f: t for f, t in self._flow_finish.items() if t > self._virtual_time}
+        start = max(self._virtual_time, self._flow_finish.get(flow, 0.0))
+        finish = start + cost / self.lane_weights[lane]
+        self._flow_finish[flow] = finish
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), lane, cost, start)
+        heapq.heappush(self._heap, (finish, next(self._seq), waiter))
+        self._depth[lane] += 1
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller went away
+                self.release()
+            else:
+                waiter.cancelled = True
+                self._depth[lane] -= 1
+            raise
+
+    def release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id=None, lane: str = LANE_BACKGROUND, cost: int = 1000):
+        await self.acquire(user_id, lane, cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        lanes = {}
+        for lane, waits in self._waits.items():
+            ordered = sorted(waits)
+            lanes[lane] = {
+                "queue_depth": self._depth[lane],
+                "granted": self._granted[lane],
+                "wait_avg_ms": (sum(ordered) / len(ordered) * 1000) if ordered else 0.0,
+                "wait_p95_ms": ordered[int(0.95 * (len(ordered) - 1))] * 1000 if ordered else 0.0,
+                "wait_max_ms": ordered[-1] * 1000 if ordered else 0.0,
+            }
+        self._refill()
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "tokens_available": round(self._tokens) if self.tokens_per_minute else None,
+            "lanes": lanes,
+        }
+
+
+def estimate_cost(messages, params) -> int:
+    """Rough token estimate for a request: prompt characters / 4 plus the completion budget"""
+    prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+    return prompt_tokens + int(params.get("max_tokens") or 1000)
+
+
+governor = LLMGovernor()
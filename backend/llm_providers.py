@@ -0,0 +1,369 @@
+# llm_providers.py
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+
+import httpx
+
+
+class LLMError(Exception):
+    """Raised when the upstream chat completion call fails"""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMTimeoutError(LLMError):
+    """Raised when the upstream call exceeds its deadline"""
+
+
+class LLMQueueTimeoutError(LLMTimeoutError):
+    """Raised when the call's deadline passes while waiting for a governor slot"""
+
+
+def malformed_response(status_code: int, body: str, error: Exception) -> LLMError:
+    # No status_code on purpose: a garbled body is retried like a dropped connection
+    return LLMError(f"Malformed OpenAI response {status_code} ({type(error).__name__}): {body[:200]}")
+
+
+class LLMProvider:
+    """Interface every chat completion backend implements"""
+
+    name = "base"
+
+    def is_configured(self) -> bool:
+        return True
+
+    async def chat(self, messages, model: str, timeout: float, **params) -> str:
+        raise NotImplementedError
+
+    async def stream_chat(self, messages, model: str, timeout: float, **params):
+        """Yield content deltas; the default emits the whole completion at once"""
+        yield await self.chat(messages, model=model, timeout=timeout, **params)
+
+    async def aclose(self):
+        pass
+
+
+# ----- OpenAI -----
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions over one pooled keep-alive HTTP connection.
+
+    Settings are read from the environment when the connection pool is first
+    created so that values loaded by ``load_dotenv()`` are picked up.
+    """
+
+    name = "openai"
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def api_key(self):
+        return os.getenv("OPENAI_API_KEY")
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(
+                max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+                max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "10")),
+                keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60")),
+            )
+            self._client = httpx.AsyncClient(
+                base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+                limits=limits,
+                timeout=httpx.Timeout(float(os.getenv("LLM_TIMEOUT", "60")), connect=10.0),
+            )
+        return self._client
+
+    def _headers(self):
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    async def chat(self, messages, model: str, timeout: float, **params) -> str:
+        if not self.is_configured():
+            raise LLMError("OpenAI API key not configured")
+
+        payload = {"model": model, "messages": messages, **params}
+        try:
+            response = await self._get_client().post(
+                "/chat/completions",
+                json=payload,
+                headers=self._headers(),
+                timeout=timeout,
+            )
+        except httpx.TimeoutException as e:
+            raise LLMTimeoutError(f"OpenAI request timed out: {e}")
+        except httpx.HTTPError as e:
+            raise LLMError(f"OpenAI request failed: {e}")
+
+        if response.status_code >= 400:
+            raise LLMError(
+                f"OpenAI API error {response.status_code}: {response.text}",
+                status_code=response.status_code,
+            )
+
+        try:
+            return response.json()["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise malformed_response(response.status_code, response.text, e)
+
+    async def stream_chat(self, messages, model: str, timeout: float, **params):
+        if not self.is_configured():
+            raise LLMError("OpenAI API key not configured")
+
+        payload = {"model": model, "messages": messages, "stream": True, **params}
+        try:
+            async with self._get_client().stream(
+                "POST",
+                "/chat/completions",
+                json=payload,
+                headers=self._headers(),
+                timeout=timeout,
+            ) as response:
+                if response.status_code >= 400:
+                    body = await response.aread()
+                    raise LLMError(
+                        f"OpenAI API error {response.status_code}: {body.decode(errors='replace')}",
+                        status_code=response.status_code,
+                    )
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        choices = json.loads(data)["choices"]
+                        # Usage-only chunks carry no choices
+                        delta = (choices[0].get("delta") or {}) if choices else {}
+                    except (ValueError, KeyError, TypeError, AttributeError) as e:
+                        raise malformed_response(response.status_code, data, e)
+                    if delta.get("content"):
+                        yield delta["content"]
+        except httpx.TimeoutException as e:
+            raise LLMTimeoutError(f"OpenAI request timed out: {e}")
+        except httpx.HTTPError as e:
+            raise LLMError(f"OpenAI request failed: {e}")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# ----- Local stub -----
+
+def request_key(messages, model: str, params) -> str:
+    """Stable hash of a chat request, used to seed the stub and key cassettes"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": {k: v for k, v in params.items() if k != "stream"}},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def parse_latency(spec: str):
+    """Parse a latency distribution such as ``fixed:0.2``, ``uniform:0.1,0.5``,
+    ``normal:0.5,0.1`` or ``lognormal:-0.5,0.4`` (seconds; lognormal takes mu, sigma)"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+
+LOREM = (
+    "Students explore the topic through guided examples, discussion and practice. "
+    "The teacher models each step, checks for understanding and adapts the pace. "
+)
+
+
+class StubProvider(LLMProvider):
+    """Deterministic offline provider for load testing.
+
+    Latency is time-to-first-token drawn from ``LLM_STUB_LATENCY`` plus the
+    completion length divided by ``LLM_STUB_TOKENS_PER_SEC``. The random
+    generator is seeded from the request, so identical requests get identical
+    responses and timings. Responses come from ``LLM_STUB_RESPONSES`` (a JSON
+    list of ``{"match": substring, "response": text}``) when a rule matches,
+    otherwise a canned document shaped like the JSON the prompt asks for.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency: str = None, tokens_per_sec: float = None, responses_path: str = None):
+        self.latency = parse_latency(latency or os.getenv("LLM_STUB_LATENCY", "lognormal:-0.7,0.4"))
+        self.tokens_per_sec = tokens_per_sec or float(os.getenv("LLM_STUB_TOKENS_PER_SEC", "60"))
+        self.rules = []
+        path = responses_path or os.getenv("LLM_STUB_RESPONSES")
+        if path:
+            with open(path) as f:
+                self.rules = json.load(f)
+
+    def _respond(self, messages, rng, max_tokens):
+        prompt = messages[-1]["content"] if messages else ""
+        for rule in self.rules:
+            if rule["match"] in prompt:
+                return rule["response"]
+
+        if '"summary"' in prompt and '"modules"' in prompt:
+            return json.dumps({"modules": [
+                {"title": f"Module {i + 1}", "summary": LOREM.split(".")[0]} for i in range(10)
+            ]})
+        lesson = {
+            "title": "Lesson",
+            "content": "<h3>Overview</h3><p>" + LOREM * 4 + "</p>",
+            "interactive_elements": "<div class='interactive-exercise'><p>Practice task</p></div>",
+            "knowledge_checks": [{
+                "type": "multiple_choice",
+                "question": "Which statement is correct?",
+                "options": ["Option A", "Option B", "Option C", "Option D"],
+                "correct_answer": "Option A"
+            }]
+        }
+        if '"lessons"' in prompt and '"modules"' not in prompt:
+            return json.dumps({"lessons": [dict(lesson, title=f"Lesson {i + 1}") for i in range(5)]})
+        if '"modules"' in prompt:
+            return json.dumps({"modules": [
+                {"title": f"Module {m + 1}", "lessons": [dict(lesson, title=f"Lesson {i + 1}") for i in range(5)]}
+                for m in range(10)
+            ]})
+        if '"questions"' in prompt:
+            return json.dumps({"questions": [{
+                "type": "multiple_choice",
+                "question": f"Question {i + 1}?",
+                "options": ["A", "B", "C", "D"],
+                "correct_answer": rng.choice("ABCD"),
+                "explanation": LOREM.split(".")[0]
+            } for i in range(10)]})
+        if '"cards"' in prompt:
+            return json.dumps({"cards": [{
+                "front": f"Term {i + 1}",
+                "back": LOREM.split(".")[0],
+                "tags": ["stub"],
+                "difficulty": rng.choice(["easy", "medium", "hard"])
+            } for i in range(10)]})
+
+        words = (LOREM * 40).split()
+        return " ".join(words[: min(len(words), int((max_tokens or 400) * 0.75))])
+
+    def _plan(self, messages, model, params):
+        rng = random.Random(request_key(messages, model, params))
+        content = self._respond(messages, rng, params.get("max_tokens"))
+        first_token = self.latency(rng)
+        tokens = max(1, math.ceil(len(content) / 4))
+        return content, first_token, tokens
+
+    async def chat(self, messages, model: str, timeout: float, **params) -> str:
+        content, first_token, tokens = self._plan(messages, model, params)
+        duration = first_token + tokens / self.tokens_per_sec
+        if timeout and duration > timeout:
+            await asyncio.sleep(timeout)
+            raise LLMTimeoutError("Stub request timed out")
+        await asyncio.sleep(duration)
+        return content
+
+    async def stream_chat(self, messages, model: str, timeout: float, **params):
+        content, first_token, tokens = self._plan(messages, model, params)
+        await asyncio.sleep(first_token)
+        # Emit roughly one token (four characters) per tick at the configured rate
+        for i in range(0, len(content), 4):
+            yield content[i:i + 4]
+            await asyncio.sleep(1 / self.tokens_per_sec)
+
+
+# ----- Record/replay cassettes -----
+
+class CassetteProvider(LLMProvider):
+    """Records completions from another provider to a JSONL cassette, or
+    replays them without touching the network.
+
+    In ``replay`` mode a request missing from the cassette raises LLMError.
+    """
+
+    def __init__(self, inner: LLMProvider, path: str, mode: str = "replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}'")
+        self.inner = inner
+        self.path = path
+        self.mode = mode
+        self.name = f"cassette:{mode}:{inner.name}"
+        self._entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry["response"]
+
+    def is_configured(self) -> bool:
+        return self.mode == "replay" or self.inner.is_configured()
+
+    def _record(self, key, messages, model, response):
+        with self._lock:
+            self._entries[key] = response
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"key": key, "model": model, "messages": messages, "response": response}) + "\n")
+
+    async def chat(self, messages, model: str, timeout: float, **params) -> str:
+        key = request_key(messages, model, params)
+        if key in self._entries:
+            return self._entries[key]
+        if self.mode == "replay":
+            raise LLMError("Request not found in cassette")
+        response = await self.inner.chat(messages, model=model, timeout=timeout, **params)
+        self._record(key, messages, model, response)
+        return response
+
+    async def stream_chat(self, messages, model: str, timeout: float, **params):
+        key = request_key(messages, model, params)
+        if key in self._entries:
+            yield self._entries[key]
+            return
+        if self.mode == "replay":
+            raise LLMError("Request not found in cassette")
+        chunks = []
+        async for chunk in self.inner.stream_chat(messages, model=model, timeout=timeout, **params):
+            chunks.append(chunk)
+            yield chunk
+        self._record(key, messages, model, "".join(chunks))
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "stub": StubProvider,
+}
+
+
+def get_provider() -> LLMProvider:
+    """Build the provider selected by ``LLM_PROVIDER``, wrapped in a cassette
+    when ``LLM_CASSETTE`` is set (``LLM_CASSETTE_MODE`` is record or replay)"""
+    name = os.getenv("LLM_PROVIDER", "openai")
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER '{name}'")
+    provider = PROVIDERS[name]()
+
+    cassette = os.getenv("LLM_CASSETTE")
+    if cassette:
+        provider = CassetteProvider(provider, cassette, os.getenv("LLM_CASSETTE_MODE", "replay"))
+    return provider
@@ -0,0 +1,100 @@
+# llm_resilience.py
+import os
+import random
+import time
+from collections import deque
+
+from llm_providers import LLMError, LLMTimeoutError
+
+
+class LLMUnavailableError(LLMError):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    rejects calls for ``reset_timeout`` seconds; it then lets a single probe
+    through (half-open) and closes again if the probe succeeds.
+    """
+
+    def __init__(self, failure_threshold: int = None, reset_timeout: float = None):
+        self.failure_threshold = failure_threshold or int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+        self.reset_timeout = reset_timeout or float(os.getenv("LLM_BREAKER_RESET", "30"))
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.counters = {"opened": 0, "rejected": 0}
+
+    def before_call(self):
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                self.counters["rejected"] += 1
+                raise LLMUnavailableError("LLM upstream unavailable (circuit open)")
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.counters["rejected"] += 1
+                raise LLMUnavailableError("LLM upstream unavailable (circuit half-open)")
+            self._probe_in_flight = True
+
+    def record_success(self):
+        self._failures = 0
+        self._probe_in_flight = False
+        self.state = "closed"
+
+    def record_failure(self):
+        self._failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                self.counters["opened"] += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def abandon(self):
+        """Release the half-open probe slot of a call that ended without an outcome (e.g. cancelled)"""
+        self._probe_in_flight = False
+
+    def stats(self):
+        return {"state": self.state, "consecutive_failures": self._failures, **self.counters}
+
+
+class LatencyTracker:
+    """Keeps recent successful call latencies per operation to derive hedge delays"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+
+    def record(self, key, seconds: float):
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key, q: float):
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(q * (len(ordered) - 1))]
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection failures, rate limits and 5xx responses are worth retrying"""
+    if isinstance(error, LLMUnavailableError):
+        return False
+    if isinstance(error, LLMTimeoutError):
+        return True
+    if isinstance(error, LLMError):
+        return error.status_code is None or error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def backoff_delay(attempt: int, base: float = None, cap: float = None) -> float:
+    """Exponential backoff with full jitter"""
+    base = base if base is not None else float(os.getenv("LLM_RETRY_BASE", "0.5"))
+    cap = cap if cap is not None else float(os.getenv("LLM_RETRY_MAX", "8"))
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -1,10 +1,13 @@
 # main.py
-import re
-from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile
+from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Request, Response, Header, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import validator
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only, selectinload
 from typing import List, Optional, Dict, Any, Union
 from datetime import datetime, timedelta
 import os
@@ -13,21 +16,29 @@ import jwt
 import bcrypt
 from pydantic import BaseModel
 import models
-from database import SessionLocal, engine, Base
+from database import (
+    SessionLocal, AsyncSessionLocal, engine, async_engine, Base,
+    ensure_columns, ensure_indexes, migrate_json_columns, pool_status
+)
 from dotenv import load_dotenv
-import openai
+from llm_client import llm_client, LLMError, DEFAULT_MODEL, LANE_INTERACTIVE
+from llm_governor import governor
+from generation_cache import generation_cache, make_cache_key
+from singleflight import single_flight
+from jobs import job_executor
+from json_stream import IncrementalJSONParser, parse_tolerant_json
+from pagination import PAGE_SIZE_DEFAULT, InvalidCursor, fetch_page
+from course_structure import build_modules, course_document, lesson_document, migrate_course_blobs
+from summaries import InvalidFields, backfill_counts, item_count, load_fields, parse_fields, summary_rows
+from dashboard import DASHBOARD_RECENT_MAX, build_summary, dashboard_cache
+from emotion import EMOTION_MODE, emotion_classifier, emotion_batcher, emotion_sidecar, emotion_cascade, detect_emotion
 import json
+import copy
+import asyncio
 import traceback
-from transformers import pipeline
-from textblob import TextBlob
 
 load_dotenv()
 
-# Set up OpenAI API client
-openai.api_key = os.getenv("OPENAI_API_KEY")  # Set in environment variables for security
-
-emotion_classifier = pipeline("text-classification", model="bhadresh-savani/distilbert-base-uncased-emotion")
-
 # Initialize database
 Base.metadata.create_all(bind=engine)
 
@@ -42,6 +53,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # JWT Settings
@@ -49,21 +61,151 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")  # Set in env vars for p
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+# Per-call deadlines (seconds) for upstream LLM requests
+LLM_TIMEOUT_CHAT = float(os.getenv("LLM_TIMEOUT_CHAT", "30"))
+LLM_TIMEOUT_GENERATE = float(os.getenv("LLM_TIMEOUT_GENERATE", "120"))
+LLM_TIMEOUT_COURSE = float(os.getenv("LLM_TIMEOUT_COURSE", "180"))
+
+# When to load the emotion model: "lazy" (first tutor request), "startup" (before serving)
+# or "background" (serve at once, /health/ready reports 503 until loaded)
+EMOTION_WARMUP = os.getenv("EMOTION_WARMUP", "lazy")
+
+# Degraded responses while the LLM upstream is failing or the circuit breaker is open
+COURSE_FALLBACK_ON_ERROR = os.getenv("COURSE_FALLBACK_ON_ERROR", "1") == "1"
+TUTOR_FALLBACK_RESPONSE = (
+    "I'm having trouble reaching my tutoring engine right now. "
+    "Please try again in a moment, or rephrase your question."
+)
+
+# Course generation: "fanout" builds an outline first and generates modules concurrently,
+# "single" asks for the whole course in one completion
+COURSE_GENERATION_STRATEGY = os.getenv("COURSE_GENERATION_STRATEGY", "fanout")
+COURSE_MODULE_COUNT = int(os.getenv("COURSE_MODULE_COUNT", "10"))
+COURSE_LESSONS_PER_MODULE = int(os.getenv("COURSE_LESSONS_PER_MODULE", "5"))
+COURSE_MODULE_CONCURRENCY = int(os.getenv("COURSE_MODULE_CONCURRENCY", "4"))
+
+# Batch generation: items generated in parallel per request, and how many results share a commit
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_COMMIT_SIZE = int(os.getenv("BATCH_COMMIT_SIZE", "20"))
+
+# Bump a tool's version whenever its prompt changes so stale cached generations are not served
+PROMPT_TEMPLATE_VERSIONS = {
+    "lesson_plan": 1,
+    "assessment": 1,
+    "activity": 1,
+    "quiz": 1,
+    "flashcards": 1,
+}
+
 # OAuth2 scheme for authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+# For endpoints that also serve anonymous clients
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
 
 @app.on_event("startup")
 async def startup_event():
-    """Create database tables if they don't exist"""
+    """Create database tables and indexes if they don't exist"""
     Base.metadata.create_all(bind=engine)
-
-# Database dependency
-def get_db():
-    db = SessionLocal()
+    for column in ensure_columns(Base.metadata, engine):
+        print(f"Added column {column}")
+    for column in migrate_json_columns(Base.metadata, engine):
+        print(f"Migrated JSON column {column}")
+    created = ensure_indexes(Base.metadata, engine)
+    if created:
+        print(f"Created missing indexes: {', '.join(created)}")
+    migrated = migrate_course_blobs(SessionLocal)
+    if migrated:
+        print(f"Split {migrated} course documents into module and lesson rows")
+    filled = backfill_counts(SessionLocal)
+    if filled:
+        print(f"Filled summary counts for {filled} rows")
+    await job_executor.start()
+    # In sidecar mode the model lives in emotion_worker.py instead
+    if EMOTION_MODE != "sidecar":
+        if EMOTION_WARMUP == "startup":
+            await emotion_classifier.warm_up()
+        elif EMOTION_WARMUP == "background":
+            app.state.emotion_warmup = asyncio.create_task(warm_up_emotion_classifier())
+
+async def warm_up_emotion_classifier():
     try:
+        await emotion_classifier.warm_up()
+    except Exception as e:
+        print(f"Emotion classifier warm-up failed: {str(e)}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers and close the pooled LLM connection"""
+    await job_executor.stop()
+    await emotion_batcher.stop()
+    await emotion_sidecar.close()
+    await llm_client.aclose()
+    await async_engine.dispose()
+    engine.dispose()
+
+@app.get("/metrics")
+def get_metrics():
+    """Report in-process counters for the generation pipeline"""
+    return {
+        "generation_cache": generation_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "llm_governor": governor.stats(),
+        "llm_client": llm_client.stats(),
+        "emotion_classifier": emotion_classifier.status(),
+        "emotion_batcher": emotion_batcher.stats(),
+        "emotion_sidecar": emotion_sidecar.stats() if EMOTION_MODE == "sidecar" else None,
+        "emotion_cascade": emotion_cascade.stats(),
+        "dashboard_cache": dashboard_cache.stats(),
+        "database": pool_status()
+    }
+
+@app.get("/health/ready")
+def readiness():
+    """Report whether this worker has finished warming up and can serve every endpoint"""
+    # In sidecar mode the worker answers from the lexicon until the emotion process is up
+    ready = (
+        EMOTION_MODE == "sidecar"
+        or emotion_classifier.ready
+        or (EMOTION_WARMUP == "lazy" and emotion_classifier.state != "failed")
+    )
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "emotion_classifier": emotion_classifier.status()}
+    )
+
+# Database dependencies
+async def get_db():
+    """Asyncio session for request handlers, so queries never block the event loop"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def list_page(db: AsyncSession, response: Response, stmt, model, cursor: Optional[str], skip: int, limit: Optional[int]):
+    """Fetch one keyset page and advertise the next one in the X-Next-Cursor header"""
+    try:
+        rows, next_cursor = await fetch_page(db, stmt, model, cursor, skip, limit)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+def requested_fields(fields: Optional[str], summary_model) -> Optional[list]:
+    """Parse ?fields=; None means the client wants full documents"""
+    if fields is None:
+        return None
+    try:
+        return parse_fields(fields, summary_model)
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def sparse_response(response: Response, rows, summary_model, names) -> JSONResponse:
+    """Serialize only the requested fields, keeping the cursor header set by list_page"""
+    next_cursor = response.headers.get("X-Next-Cursor")
+    return JSONResponse(
+        content=summary_rows(rows, summary_model, names),
+        headers={"X-Next-Cursor": next_cursor} if next_cursor else None
+    )
 
 
 # ----- Pydantic Models -----
@@ -84,15 +226,6 @@ class User(UserBase):
     
     class Config:
         from_attributes = True
-    
-    @validator('subjects', pre=True)
-    def parse_subjects(cls, value):
-        if isinstance(value, str):
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return []
-        return value
 
 class UserLogin(BaseModel):
     email: str
@@ -124,15 +257,17 @@ class LessonPlan(LessonPlanBase):
     
     class Config:
         fom_attributes = True
-    
-    @validator('objectives', 'materials', pre=True)
-    def parse_json_lists(cls, value):
-        if isinstance(value, str):
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return []
-        return value
+
+class LessonPlanSummary(BaseModel):
+    """Fields available to ?fields= on the lesson plan list (no content)"""
+    id: Optional[int] = None
+    title: Optional[str] = None
+    subject: Optional[str] = None
+    grade_level: Optional[str] = None
+    duration: Optional[str] = None
+    objectives: Optional[List[str]] = None
+    user_id: Optional[int] = None
+    created_at: Optional[datetime] = None
 
 class AssessmentBase(BaseModel):
     title: str
@@ -152,6 +287,16 @@ class Assessment(AssessmentBase):
     class Config:
         from_attributes = True
 
+class AssessmentSummary(BaseModel):
+    """Fields available to ?fields= on the assessment list (no content)"""
+    id: Optional[int] = None
+    title: Optional[str] = None
+    assessment_type: Optional[str] = None
+    subject: Optional[str] = None
+    grade_level: Optional[str] = None
+    user_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+
 class AIRequest(BaseModel):
     tool_type: str  # lesson_plan, assessment, activity, etc.
     parameters: Dict[str, Any]
@@ -179,8 +324,18 @@ class StudentRecordBase(BaseModel):
     student_name: str
     student_id: Optional[str] = None
     notes: Optional[str] = None
-    performance_data: Optional[str] = None
+    performance_data: Optional[Any] = None
     class_id: int
+    
+    @validator('performance_data', pre=True)
+    def parse_performance_data(cls, value):
+        # Older clients send the object as a JSON-encoded string
+        if isinstance(value, str):
+            try:
+                return json.loads(value)
+            except json.JSONDecodeError:
+                return value
+        return value
 
 class StudentRecordCreate(StudentRecordBase):
     pass
@@ -238,9 +393,10 @@ def get_password_hash(password):
 def verify_password(plain_password, hashed_password):
     return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user or not verify_password(password, user.password):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await db.scalar(select(models.User).filter(models.User.email == email))
+    # bcrypt is deliberately slow; keep it off the event loop
+    if not user or not await asyncio.to_thread(verify_password, password, user.password):
         return False
     return user
 
@@ -254,7 +410,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -268,38 +424,50 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = TokenData(email=email)
     except jwt.PyJWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+    user = await db.scalar(select(models.User).filter(models.User.email == token_data.email))
     if user is None:
         raise credentials_exception
     return user
 
+def get_caller_key(http_request: Request, token: Optional[str] = Depends(optional_oauth2_scheme)) -> str:
+    """Who an open endpoint's LLM calls are charged to in the governor's fair queue:
+    the signed-in user when a valid token comes along, otherwise the client address"""
+    if token:
+        try:
+            email = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+            if email:
+                return f"user:{email}"
+        except jwt.PyJWTError:
+            pass
+    return f"client:{http_request.client.host if http_request.client else 'unknown'}"
+
 # ----- API Routes -----
 
 @app.post("/register", response_model=User)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if user already exists
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await db.scalar(select(models.User).filter(models.User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await asyncio.to_thread(get_password_hash, user.password)
     db_user = models.User(
         email=user.email,
         name=user.name,
         password=hashed_password,
         school=user.school,
         grade_level=user.grade_level,
-        subjects=json.dumps(user.subjects) if user.subjects else json.dumps([])
+        subjects=user.subjects or []
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @app.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -317,57 +485,68 @@ def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @app.post("/lesson-plans", response_model=LessonPlan)
-def create_lesson_plan(
+async def create_lesson_plan(
     lesson_plan: LessonPlanCreate, 
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     db_lesson_plan = models.LessonPlan(
         title=lesson_plan.title,
         subject=lesson_plan.subject,
         grade_level=lesson_plan.grade_level,
         duration=lesson_plan.duration,
-        objectives=json.dumps(lesson_plan.objectives),
-        materials=json.dumps(lesson_plan.materials),
+        objectives=lesson_plan.objectives,
+        materials=lesson_plan.materials,
         content=lesson_plan.content,
         user_id=current_user.id
     )
     db.add(db_lesson_plan)
-    db.commit()
-    db.refresh(db_lesson_plan)
+    await db.commit()
+    dashboard_cache.invalidate(current_user.id)
+    await db.refresh(db_lesson_plan)
     return db_lesson_plan
 
 @app.get("/lesson-plans", response_model=List[LessonPlan])
-def get_lesson_plans(
+async def get_lesson_plans(
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1),
+    fields: Optional[str] = None
 ):
-    lesson_plans = db.query(models.LessonPlan).filter(
+    """List lesson plans; ?fields= returns only those LessonPlanSummary fields"""
+    names = requested_fields(fields, LessonPlanSummary)
+    stmt = select(models.LessonPlan).filter(
         models.LessonPlan.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    )
+    if names:
+        stmt = load_fields(stmt, models.LessonPlan, names)
+    lesson_plans = await list_page(db, response, stmt, models.LessonPlan, cursor, skip, limit)
+    if names:
+        return sparse_response(response, lesson_plans, LessonPlanSummary, names)
     return lesson_plans
 
 @app.get("/lesson-plans/{lesson_plan_id}", response_model=LessonPlan)
-def get_lesson_plan(
+async def get_lesson_plan(
     lesson_plan_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    lesson_plan = db.query(models.LessonPlan).filter(
+    lesson_plan = await db.scalar(select(models.LessonPlan).filter(
         models.LessonPlan.id == lesson_plan_id,
         models.LessonPlan.user_id == current_user.id
-    ).first()
+    ))
     if not lesson_plan:
         raise HTTPException(status_code=404, detail="Lesson plan not found")
     return lesson_plan
 
 @app.post("/assessments", response_model=Assessment)
-def create_assessment(
+async def create_assessment(
     assessment: AssessmentCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     db_assessment = models.Assessment(
         title=assessment.title,
@@ -378,49 +557,56 @@ def create_assessment(
         user_id=current_user.id
     )
     db.add(db_assessment)
-    db.commit()
-    db.refresh(db_assessment)
+    await db.commit()
+    dashboard_cache.invalidate(current_user.id)
+    await db.refresh(db_assessment)
     return db_assessment
 
 @app.get("/assessments", response_model=List[Assessment])
-def get_assessments(
+async def get_assessments(
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1),
+    fields: Optional[str] = None
 ):
-    assessments = db.query(models.Assessment).filter(
+    """List assessments; ?fields= returns only those AssessmentSummary fields"""
+    names = requested_fields(fields, AssessmentSummary)
+    stmt = select(models.Assessment).filter(
         models.Assessment.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    )
+    if names:
+        stmt = load_fields(stmt, models.Assessment, names)
+    assessments = await list_page(db, response, stmt, models.Assessment, cursor, skip, limit)
+    if names:
+        return sparse_response(response, assessments, AssessmentSummary, names)
     return assessments
 
 @app.get("/assessments/{assessment_id}", response_model=Assessment)
-def get_assessment(
+async def get_assessment(
     assessment_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    assessment = db.query(models.Assessment).filter(
+    assessment = await db.scalar(select(models.Assessment).filter(
         models.Assessment.id == assessment_id,
         models.Assessment.user_id == current_user.id
-    ).first()
+    ))
     
     if not assessment:
         raise HTTPException(status_code=404, detail="Assessment not found")
     
     return assessment
 
-@app.post("/ai/generate")
-async def generate_with_ai(
-    request: AIRequest,
-    current_user: User = Depends(get_current_user)
-):
+def build_ai_messages(request: AIRequest):
+    """Build the chat messages for an /ai/generate tool request"""
     # Map the tool type to specific prompts and processing
-    try:
-        if request.tool_type == "lesson_plan":
-            system_message = """You are a world-class educational consultant with deep expertise in curriculum design, neurodiversity inclusion, differentiated instruction, and research-based pedagogy. Your mission is to create hour-by-hour lesson plans that maximize learning for ALL students, regardless of background, ability, or learning profile. Your designs are detailed enough for any substitute teacher to deliver flawlessly, yet sophisticated enough for master teachers to expand upon."""
-            
-            user_message = f"""
+    if request.tool_type == "lesson_plan":
+        system_message = """You are a world-class educational consultant with deep expertise in curriculum design, neurodiversity inclusion, differentiated instruction, and research-based pedagogy. Your mission is to create hour-by-hour lesson plans that maximize learning for ALL students, regardless of background, ability, or learning profile. Your designs are detailed enough for any substitute teacher to deliver flawlessly, yet sophisticated enough for master teachers to expand upon."""
+
+        user_message = f"""
    Create an exceptionally detailed **hour-by-hour instructional plan** for:
 
 - **Subject**: {request.parameters.get('subject')}
@@ -558,13 +744,13 @@ The final lesson plan must reflect:
 
 Create a plan that is BOTH deeply **structured** and **adaptable** for maximum impact in a real-world classroom.
     """
-            
-        elif request.tool_type == "assessment":
-            system_message = """You are an expert in educational assessment design. 
+
+    elif request.tool_type == "assessment":
+        system_message = """You are an expert in educational assessment design. 
             Create a comprehensive assessment based on the parameters provided."""
-            
-            assessment_type = request.parameters.get('assessment_type', 'quiz')
-            user_message = f"""
+
+        assessment_type = request.parameters.get('assessment_type', 'quiz')
+        user_message = f"""
             Create a detailed {assessment_type} with the following specifications:
             Subject: {request.parameters.get('subject')}
             Grade Level: {request.parameters.get('grade_level')}
@@ -574,12 +760,12 @@ Create a plan that is BOTH deeply **structured** and **adaptable** for maximum i
             Provide an answer key or rubric as applicable.
             Format the assessment in a clear, organized manner.
             """
-            
-        elif request.tool_type == "activity":
-            system_message = """You are an expert in designing engaging classroom activities.
+
+    elif request.tool_type == "activity":
+        system_message = """You are an expert in designing engaging classroom activities.
             Create an interactive learning activity based on the parameters provided."""
-            
-            user_message = f"""
+
+        user_message = f"""
             Create a detailed classroom activity with the following specifications:
             Activity Type: {request.parameters.get('activity_type')}
             Subject: {request.parameters.get('subject')}
@@ -596,34 +782,150 @@ Create a plan that is BOTH deeply **structured** and **adaptable** for maximum i
             
             Format the activity in a clear, organized manner that a teacher can easily follow.
             """
-        else:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Tool type '{request.tool_type}' not supported"
-            )
+    else:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Tool type '{request.tool_type}' not supported"
+        )
+    
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message}
+    ]
+
+def generation_cache_key(tool_type: str, parameters) -> str:
+    return make_cache_key(tool_type, DEFAULT_MODEL, PROMPT_TEMPLATE_VERSIONS.get(tool_type), parameters)
+
+def cache_policy(cache_control: Optional[str]):
+    """Return (read, write) cache flags for a request's Cache-Control header"""
+    directives = {d.strip().lower() for d in (cache_control or "").split(",")}
+    if "no-store" in directives:
+        return False, False
+    if "no-cache" in directives:
+        return False, True
+    return True, True
+
+async def cached_generation(tool_type: str, parameters, cache_control: Optional[str], generate):
+    """Serve a generation from the cache, or await ``generate()`` and store its result"""
+    key = generation_cache_key(tool_type, parameters)
+    read, write = cache_policy(cache_control)
+    if read:
+        cached = await generation_cache.get(key)
+        if cached is not None:
+            return cached
+    else:
+        generation_cache.record_bypass()
+    
+    async def generate_and_store():
+        value = await generate()
+        if write:
+            await generation_cache.set(key, value, tool_type)
+        return value
+    
+    try:
+        # Identical requests arriving while this one is in flight share its upstream call
+        return await single_flight.do(key, generate_and_store)
+    except LLMError:
+        # Upstream is failing: fall back to the last generation for this request, even if expired
+        stale = await generation_cache.get(key, allow_stale=True)
+        if stale is None:
+            raise
+        print(f"Serving stale {tool_type} generation while the LLM upstream is unavailable")
+        return stale
+
+def sse_event(data, event: Optional[str] = None) -> str:
+    """Format a Server-Sent Events frame with a JSON payload"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+def wants_event_stream(http_request: Request) -> bool:
+    return "text/event-stream" in http_request.headers.get("accept", "")
+
+async def stream_ai_generation(request: AIRequest, messages, cache_control: Optional[str], user_id: int):
+    """Forward completion tokens to the client as SSE frames"""
+    key = generation_cache_key(request.tool_type, request.parameters)
+    read, write = cache_policy(cache_control)
+    try:
+        cached = await generation_cache.get(key) if read else None
+        if cached is not None:
+            yield sse_event({"content": cached, "cached": True})
+            yield sse_event({}, event="done")
+            return
+        if not read:
+            generation_cache.record_bypass()
         
+        tokens = []
+        async for token in llm_client.stream_chat(
+            messages=messages,
+            user_id=user_id,
+            temperature=0.7,
+            max_tokens=2000,
+            timeout=LLM_TIMEOUT_GENERATE
+        ):
+            tokens.append(token)
+            yield sse_event({"content": token})
+        if write:
+            await generation_cache.set(key, "".join(tokens), request.tool_type)
+        yield sse_event({}, event="done")
+    except Exception as e:
+        yield sse_event({"detail": str(e)}, event="error")
+
+async def generate_ai_content(request: AIRequest, user_id: int, cache_control: Optional[str] = None) -> str:
+    """Generate (or serve from the cache) the content for an /ai/generate tool request"""
+    messages = build_ai_messages(request)
+    
+    async def generate():
         # Call OpenAI API
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",  # Use appropriate model
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ],
+        return await llm_client.chat(
+            messages=messages,
+            user_id=user_id,
             temperature=0.7,
-            max_tokens=2000
+            max_tokens=2000,
+            timeout=LLM_TIMEOUT_GENERATE
         )
+    
+    return await cached_generation(request.tool_type, request.parameters, cache_control, generate)
+
+@app.post("/ai/generate")
+async def generate_with_ai(
+    request: AIRequest,
+    http_request: Request,
+    current_user: User = Depends(get_current_user),
+    cache_control: Optional[str] = Header(None)
+):
+    if wants_event_stream(http_request):
+        return await generate_with_ai_stream(request, current_user, cache_control)
+    
+    try:
+        content = await generate_ai_content(request, current_user.id, cache_control)
         
         # Extract and return the generated content
-        return {"content": response.choices[0].message.content}
+        return {"content": content}
         
+    except LLMError as e:
+        raise HTTPException(status_code=503, detail=f"AI generation unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/ai/generate/stream")
+async def generate_with_ai_stream(
+    request: AIRequest,
+    current_user: User = Depends(get_current_user),
+    cache_control: Optional[str] = Header(None)
+):
+    """Stream the generated content as Server-Sent Events while tokens arrive"""
+    messages = build_ai_messages(request)
+    return StreamingResponse(
+        stream_ai_generation(request, messages, cache_control, current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/upload-resource", response_model=ResourceResponse)
 async def upload_resource(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Create directory if it doesn't exist
     user_dir = f"uploads/{current_user.id}"
@@ -642,30 +944,33 @@ async def upload_resource(
         user_id=current_user.id
     )
     db.add(db_resource)
-    db.commit()
-    db.refresh(db_resource)
+    await db.commit()
+    dashboard_cache.invalidate(current_user.id)
+    await db.refresh(db_resource)
     
     return db_resource
 
 # ----- Class and Student Record Endpoints -----
 
 @app.get("/classes", response_model=List[ClassResponse])
-def get_classes(
+async def get_classes(
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1)
 ):
-    classes = db.query(models.Class).filter(
+    classes = await list_page(db, response, select(models.Class).filter(
         models.Class.teacher_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    ), models.Class, cursor, skip, limit)
     return classes
 
 @app.post("/classes", response_model=ClassResponse)
-def create_class(
+async def create_class(
     class_data: ClassCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     db_class = models.Class(
         name=class_data.name,
@@ -676,20 +981,20 @@ def create_class(
         teacher_id=current_user.id
     )
     db.add(db_class)
-    db.commit()
-    db.refresh(db_class)
+    await db.commit()
+    await db.refresh(db_class)
     return db_class
 
 @app.get("/classes/{class_id}", response_model=ClassResponse)
-def get_class(
+async def get_class(
     class_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_class = db.query(models.Class).filter(
+    db_class = await db.scalar(select(models.Class).filter(
         models.Class.id == class_id,
         models.Class.teacher_id == current_user.id
-    ).first()
+    ))
     
     if not db_class:
         raise HTTPException(status_code=404, detail="Class not found")
@@ -697,16 +1002,16 @@ def get_class(
     return db_class
 
 @app.put("/classes/{class_id}", response_model=ClassResponse)
-def update_class(
+async def update_class(
     class_id: int,
     class_data: ClassBase,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_class = db.query(models.Class).filter(
+    db_class = await db.scalar(select(models.Class).filter(
         models.Class.id == class_id,
         models.Class.teacher_id == current_user.id
-    ).first()
+    ))
     
     if not db_class:
         raise HTTPException(status_code=404, detail="Class not found")
@@ -715,69 +1020,77 @@ def update_class(
     for field, value in class_data.dict().items():
         setattr(db_class, field, value)
     
-    db.commit()
-    db.refresh(db_class)
+    await db.commit()
+    await db.refresh(db_class)
     return db_class
 
 @app.delete("/classes/{class_id}")
-def delete_class(
+async def delete_class(
     class_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    db_class = db.query(models.Class).filter(
+    db_class = await db.scalar(select(models.Class).filter(
         models.Class.id == class_id,
         models.Class.teacher_id == current_user.id
-    ).first()
+    ))
     
     if not db_class:
         raise HTTPException(status_code=404, detail="Class not found")
     
     # First delete all students in this class
-    db.query(models.StudentRecord).filter(
+    await db.execute(delete(models.StudentRecord).where(
         models.StudentRecord.class_id == class_id
-    ).delete()
+    ))
     
     # Then delete the class
-    db.delete(db_class)
-    db.commit()
+    await db.delete(db_class)
+    await db.commit()
     
     return {"message": "Class deleted successfully"}
 
 @app.get("/classes/{class_id}/students", response_model=List[StudentRecordResponse])
-def get_class_students(
+async def get_class_students(
     class_id: int,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1),
+    max_average: Optional[float] = None
 ):
+    """List a class's students, optionally only those whose performance_data
+    average is below max_average (evaluated in the database)"""
     # First verify class belongs to current user
-    db_class = db.query(models.Class).filter(
+    db_class = await db.scalar(select(models.Class).filter(
         models.Class.id == class_id,
         models.Class.teacher_id == current_user.id
-    ).first()
+    ))
     
     if not db_class:
         raise HTTPException(status_code=404, detail="Class not found")
     
-    students = db.query(models.StudentRecord).filter(
+    stmt = select(models.StudentRecord).filter(
         models.StudentRecord.class_id == class_id
-    ).offset(skip).limit(limit).all()
+    )
+    if max_average is not None:
+        stmt = stmt.filter(models.StudentRecord.performance_data["average"].as_float() < max_average)
+    students = await list_page(db, response, stmt, models.StudentRecord, cursor, skip, limit)
     
     return students
 
 @app.post("/student-records", response_model=StudentRecordResponse)
-def create_student_record(
+async def create_student_record(
     student_data: StudentRecordCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # First verify class belongs to current user
-    db_class = db.query(models.Class).filter(
+    db_class = await db.scalar(select(models.Class).filter(
         models.Class.id == student_data.class_id,
         models.Class.teacher_id == current_user.id
-    ).first()
+    ))
     
     if not db_class:
         raise HTTPException(status_code=404, detail="Class not found")
@@ -792,20 +1105,20 @@ def create_student_record(
     )
     
     db.add(db_student)
-    db.commit()
-    db.refresh(db_student)
+    await db.commit()
+    await db.refresh(db_student)
     return db_student
 
 @app.get("/student-records/{student_id}", response_model=StudentRecordResponse)
-def get_student_record(
+async def get_student_record(
     student_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    student = db.query(models.StudentRecord).filter(
+    student = await db.scalar(select(models.StudentRecord).filter(
         models.StudentRecord.id == student_id,
         models.StudentRecord.user_id == current_user.id
-    ).first()
+    ))
     
     if not student:
         raise HTTPException(status_code=404, detail="Student record not found")
@@ -813,26 +1126,26 @@ def get_student_record(
     return student
 
 @app.put("/student-records/{student_id}", response_model=StudentRecordResponse)
-def update_student_record(
+async def update_student_record(
     student_id: int,
     student_data: StudentRecordBase,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    student = db.query(models.StudentRecord).filter(
+    student = await db.scalar(select(models.StudentRecord).filter(
         models.StudentRecord.id == student_id,
         models.StudentRecord.user_id == current_user.id
-    ).first()
+    ))
     
     if not student:
         raise HTTPException(status_code=404, detail="Student record not found")
     
     # If class_id is being updated, verify new class belongs to current user
     if student_data.class_id != student.class_id:
-        db_class = db.query(models.Class).filter(
+        db_class = await db.scalar(select(models.Class).filter(
             models.Class.id == student_data.class_id,
             models.Class.teacher_id == current_user.id
-        ).first()
+        ))
         
         if not db_class:
             raise HTTPException(status_code=404, detail="Class not found")
@@ -841,43 +1154,43 @@ def update_student_record(
     for field, value in student_data.dict().items():
         setattr(student, field, value)
     
-    db.commit()
-    db.refresh(student)
+    await db.commit()
+    await db.refresh(student)
     return student
 
 @app.delete("/student-records/{student_id}")
-def delete_student_record(
+async def delete_student_record(
     student_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    student = db.query(models.StudentRecord).filter(
+    student = await db.scalar(select(models.StudentRecord).filter(
         models.StudentRecord.id == student_id,
         models.StudentRecord.user_id == current_user.id
-    ).first()
+    ))
     
     if not student:
         raise HTTPException(status_code=404, detail="Student record not found")
     
-    db.delete(student)
-    db.commit()
+    await db.delete(student)
+    await db.commit()
     
     return {"message": "Student record deleted successfully"}
 
 # ----- User Profile Endpoints -----
 
 @app.put("/users/{user_id}", response_model=User)
-def update_user(
+async def update_user(
     user_id: int,
     user_data: UserBase,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Users can only update their own profile
     if user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this profile")
     
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = await db.scalar(select(models.User).filter(models.User.id == user_id))
     
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -885,70 +1198,67 @@ def update_user(
     # Update user fields
     update_data = user_data.dict(exclude_unset=True)
     
-    # Handle subjects list
-    if "subjects" in update_data and isinstance(update_data["subjects"], list):
-        # Store as JSON string in database
-        update_data["subjects"] = json.dumps(update_data["subjects"])
-    
     # Update fields
     for key, value in update_data.items():
         setattr(db_user, key, value)
     
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @app.put("/users/{user_id}/change-password")
-def change_password(
+async def change_password(
     user_id: int,
     password_data: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Users can only change their own password
     if user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to change this password")
     
     # Verify current password
-    if not verify_password(password_data["current_password"], current_user.password):
+    if not await asyncio.to_thread(verify_password, password_data["current_password"], current_user.password):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Update password
-    hashed_password = get_password_hash(password_data["new_password"])
+    hashed_password = await asyncio.to_thread(get_password_hash, password_data["new_password"])
     
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = await db.scalar(select(models.User).filter(models.User.id == user_id))
     db_user.password = hashed_password
     
-    db.commit()
+    await db.commit()
     
     return {"message": "Password changed successfully"}
 
 # ----- Activity Endpoints -----
 
 @app.get("/activities", response_model=List[ActivityResponse])
-def get_activities(
+async def get_activities(
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1)
 ):
-    activities = db.query(models.Activity).filter(
+    activities = await list_page(db, response, select(models.Activity).filter(
         models.Activity.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    ), models.Activity, cursor, skip, limit)
     return activities
 
 @app.post("/activities", response_model=ActivityResponse)
-def create_activity(
+async def create_activity(
     activity_data: ActivityCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if associated with a lesson plan, and verify it belongs to user
     if activity_data.lesson_plan_id:
-        lesson_plan = db.query(models.LessonPlan).filter(
+        lesson_plan = await db.scalar(select(models.LessonPlan).filter(
             models.LessonPlan.id == activity_data.lesson_plan_id,
             models.LessonPlan.user_id == current_user.id
-        ).first()
+        ))
         
         if not lesson_plan:
             raise HTTPException(status_code=404, detail="Lesson plan not found")
@@ -970,20 +1280,21 @@ def create_activity(
     )
     
     db.add(db_activity)
-    db.commit()
-    db.refresh(db_activity)
+    await db.commit()
+    dashboard_cache.invalidate(current_user.id)
+    await db.refresh(db_activity)
     return db_activity
 
 @app.get("/activities/{activity_id}", response_model=ActivityResponse)
-def get_activity(
+async def get_activity(
     activity_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    activity = db.query(models.Activity).filter(
+    activity = await db.scalar(select(models.Activity).filter(
         models.Activity.id == activity_id,
         models.Activity.user_id == current_user.id
-    ).first()
+    ))
     
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
@@ -991,26 +1302,26 @@ def get_activity(
     return activity
 
 @app.put("/activities/{activity_id}", response_model=ActivityResponse)
-def update_activity(
+async def update_activity(
     activity_id: int,
     activity_data: ActivityBase,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    activity = db.query(models.Activity).filter(
+    activity = await db.scalar(select(models.Activity).filter(
         models.Activity.id == activity_id,
         models.Activity.user_id == current_user.id
-    ).first()
+    ))
     
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
     
     # Check if associated with a lesson plan, and verify it belongs to user
     if activity_data.lesson_plan_id:
-        lesson_plan = db.query(models.LessonPlan).filter(
+        lesson_plan = await db.scalar(select(models.LessonPlan).filter(
             models.LessonPlan.id == activity_data.lesson_plan_id,
             models.LessonPlan.user_id == current_user.id
-        ).first()
+        ))
         
         if not lesson_plan:
             raise HTTPException(status_code=404, detail="Lesson plan not found")
@@ -1025,53 +1336,57 @@ def update_activity(
     for key, value in update_data.items():
         setattr(activity, key, value)
     
-    db.commit()
-    db.refresh(activity)
+    await db.commit()
+    dashboard_cache.invalidate(current_user.id)
+    await db.refresh(activity)
     return activity
 
 @app.delete("/activities/{activity_id}")
-def delete_activity(
+async def delete_activity(
     activity_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    activity = db.query(models.Activity).filter(
+    activity = await db.scalar(select(models.Activity).filter(
         models.Activity.id == activity_id,
         models.Activity.user_id == current_user.id
-    ).first()
+    ))
     
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
     
-    db.delete(activity)
-    db.commit()
+    await db.delete(activity)
+    await db.commit()
+    dashboard_cache.invalidate(current_user.id)
     
     return {"message": "Activity deleted successfully"}
 
 # ----- Resource Management Endpoints -----
 
 @app.get("/resources", response_model=List[ResourceResponse])
-def get_resources(
+async def get_resources(
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1)
 ):
-    resources = db.query(models.Resource).filter(
+    resources = await list_page(db, response, select(models.Resource).filter(
         models.Resource.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    ), models.Resource, cursor, skip, limit)
     return resources
 
 @app.get("/resources/{resource_id}", response_model=ResourceResponse)
-def get_resource(
+async def get_resource(
     resource_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    resource = db.query(models.Resource).filter(
+    resource = await db.scalar(select(models.Resource).filter(
         models.Resource.id == resource_id,
         models.Resource.user_id == current_user.id
-    ).first()
+    ))
     
     if not resource:
         raise HTTPException(status_code=404, detail="Resource not found")
@@ -1079,16 +1394,16 @@ def get_resource(
     return resource
 
 @app.put("/resources/{resource_id}", response_model=ResourceResponse)
-def update_resource(
+async def update_resource(
     resource_id: int,
     resource_data: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    resource = db.query(models.Resource).filter(
+    resource = await db.scalar(select(models.Resource).filter(
         models.Resource.id == resource_id,
         models.Resource.user_id == current_user.id
-    ).first()
+    ))
     
     if not resource:
         raise HTTPException(status_code=404, detail="Resource not found")
@@ -1097,20 +1412,21 @@ def update_resource(
     if "description" in resource_data:
         resource.description = resource_data["description"]
     
-    db.commit()
-    db.refresh(resource)
+    await db.commit()
+    dashboard_cache.invalidate(current_user.id)
+    await db.refresh(resource)
     return resource
 
 @app.delete("/resources/{resource_id}")
-def delete_resource(
+async def delete_resource(
     resource_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    resource = db.query(models.Resource).filter(
+    resource = await db.scalar(select(models.Resource).filter(
         models.Resource.id == resource_id,
         models.Resource.user_id == current_user.id
-    ).first()
+    ))
     
     if not resource:
         raise HTTPException(status_code=404, detail="Resource not found")
@@ -1123,8 +1439,9 @@ def delete_resource(
         print(f"Error: Could not delete file {resource.file_path}")
     
     # Delete from database
-    db.delete(resource)
-    db.commit()
+    await db.delete(resource)
+    await db.commit()
+    dashboard_cache.invalidate(current_user.id)
     
     return {"message": "Resource deleted successfully"}
 
@@ -1149,6 +1466,43 @@ class CourseResponse(CourseBase):
     
     class Config:
         from_attributes = True
+
+class CourseSummary(BaseModel):
+    """Fields available to ?fields= on the course list (no content or modules)"""
+    id: Optional[int] = None
+    title: Optional[str] = None
+    subject: Optional[str] = None
+    difficulty_level: Optional[str] = None
+    learning_style: Optional[str] = None
+    pace: Optional[str] = None
+    module_count: Optional[int] = None
+    user_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+class LessonOutline(BaseModel):
+    index: int
+    title: Optional[str] = None
+
+class ModuleOutline(BaseModel):
+    index: int
+    title: Optional[str] = None
+    lessons: List[LessonOutline] = []
+
+class CourseOutlineResponse(BaseModel):
+    id: int
+    title: str
+    subject: str
+    difficulty_level: str
+    learning_style: str
+    pace: str
+    created_at: datetime
+    modules: List[ModuleOutline]
+
+class CourseLessonResponse(BaseModel):
+    course_id: int
+    module_index: int
+    index: int
+    lesson: Dict[str, Any]
     
 
 class QuizBase(BaseModel):
@@ -1168,15 +1522,17 @@ class QuizResponse(QuizBase):
     
     class Config:
         from_attributes = True
-    
-    @validator('questions', 'target_knowledge_gaps', pre=True)
-    def parse_json_fields(cls, value):
-        if isinstance(value, str):
-            try:
-                return json.loads(value)
-            except:
-                return []
-        return value
+
+class QuizSummary(BaseModel):
+    """Fields available to ?fields= on the quiz list (no questions)"""
+    id: Optional[int] = None
+    title: Optional[str] = None
+    course_id: Optional[int] = None
+    difficulty_level: Optional[str] = None
+    target_knowledge_gaps: Optional[List[str]] = None
+    question_count: Optional[int] = None
+    user_id: Optional[int] = None
+    created_at: Optional[datetime] = None
     
 class Card(BaseModel):
     front: str
@@ -1199,15 +1555,42 @@ class FlashcardResponse(FlashcardBase):
     
     class Config:
         from_attributes = True
-    
-    @validator('cards', pre=True)
-    def parse_cards(cls, value):
-        if isinstance(value, str):
-            try:
-                return json.loads(value)
-            except:
-                return []
-        return value
+
+class FlashcardSetSummary(BaseModel):
+    """Fields available to ?fields= on the flashcard list (no cards)"""
+    id: Optional[int] = None
+    title: Optional[str] = None
+    course_id: Optional[int] = None
+    card_count: Optional[int] = None
+    user_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+class DashboardCounts(BaseModel):
+    lesson_plans: int
+    assessments: int
+    activities: int
+    resources: int
+    courses: int
+    quizzes: int
+    flashcard_sets: int
+
+class RecentItem(BaseModel):
+    type: str  # lesson_plan, assessment, activity, course, quiz, flashcard_set
+    id: int
+    title: Optional[str] = None
+    created_at: datetime
+
+class SubjectCount(BaseModel):
+    subject: str
+    count: int
+
+class DashboardSummary(BaseModel):
+    counts: DashboardCounts
+    recent: List[RecentItem]
+    weekly_activity: List[int]  # items created in the last 7 days per UTC weekday, Sunday first
+    popular_subjects: List[SubjectCount]
+    engagement_rate: int  # percent of items created in the last 30 days
+    average_progress: int  # mean course progress percentage
 
 class ChatRequest(BaseModel):
     user_input: str
@@ -1216,23 +1599,38 @@ class ChatResponse(BaseModel):
     sentiment: str
     response: str
 
+class JobResponse(BaseModel):
+    id: str
+    job_type: str
+    status: str  # queued, running, succeeded, failed
+    result_id: Optional[int] = None
+    result: Optional[CourseResponse] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class BatchItem(AIRequest):
+    # tool_type is lesson_plan, assessment, activity, quiz or flashcards; quiz and
+    # flashcards take the same fields as /quizzes/generate and /flashcards/generate
+    title: Optional[str] = None
+
+class BatchGenerateRequest(BaseModel):
+    items: List[BatchItem]
+    persist: bool = True
+
+
+COURSE_COMPLETION_PARAMS = {
+    "temperature": 0.5,  # Lower temperature for more structured output
+    "max_tokens": 4000,  # Increased for larger course content
+    "top_p": 0.95,
+    "frequency_penalty": 0,
+    "presence_penalty": 0,
+}
 
-@app.post("/courses", response_model=CourseResponse)
-def create_course(
-    course: CourseCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    try:
-        # Check if OpenAI API key is set
-        if not openai.api_key:
-            raise HTTPException(
-                status_code=500,
-                detail="OpenAI API key not configured"
-            )
-        
-        # Enhanced system message with detailed instructions
-        system_message = f"""You are an expert curriculum designer with expertise in creating engaging, structured learning experiences.
+def build_course_messages(course: CourseCreate):
+    """Build the chat messages used to generate a full course"""
+    # Enhanced system message with detailed instructions
+    system_message = f"""You are an expert curriculum designer with expertise in creating engaging, structured learning experiences.
 
 Your task is to create a comprehensive, well-structured course on "{course.subject}" tailored specifically for {course.learning_style} learners at a {course.difficulty_level} level with a {course.pace} pace.
 
@@ -1242,9 +1640,9 @@ The content must be formatted with proper HTML tags for rich rendering. Use <h3>
 
 Your response must be in valid JSON format with the exact structure specified in the user's message.
 """
-        
-        # Enhanced user message with specific guidance and examples
-        user_message = f"""
+
+    # Enhanced user message with specific guidance and examples
+    user_message = f"""
 Create a comprehensive course titled "{course.title}" with the following specifications:
 - Subject: {course.subject}
 - Difficulty Level: {course.difficulty_level}
@@ -1292,83 +1690,300 @@ For example, a lesson on "Introduction to Python" might include:
 
 DO NOT include any explanatory text before or after the JSON. Return ONLY valid JSON.
 """
-        
-        # Make the API call with increased max_tokens and adjusted temperature
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",  # Using a model with larger context
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.5,  # Lower temperature for more structured output
-            max_tokens=4000,  # Increased for larger course content
-            top_p=0.95,
-            frequency_penalty=0,
-            presence_penalty=0
-        )
-        
-        # Extract the response content
-        course_content = response.choices[0].message.content
-        print(f"AI Response: {course_content[:500]}...")  # Log first part of response
-        
-        # Clean up the response to extract valid JSON
-        # First, try direct JSON parsing
+    
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message}
+    ]
+
+def build_outline_messages(course: CourseCreate):
+    """Build the chat messages for the short outline call of a fan-out course"""
+    system_message = f"""You are an expert curriculum designer. Plan a well-structured course on "{course.subject}" for {course.learning_style} learners at a {course.difficulty_level} level with a {course.pace} pace.
+
+Your response must be valid JSON only."""
+    
+    user_message = f"""
+Outline the course titled "{course.title}" as {COURSE_MODULE_COUNT} modules that follow a logical progression.
+
+Return ONLY a valid JSON object with the following structure:
+
+{{
+  "modules": [
+    {{"title": "Module Title", "summary": "One sentence describing what the module covers"}}
+  ]
+}}
+"""
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message}
+    ]
+
+def build_module_messages(course: CourseCreate, outline, index: int):
+    """Build the chat messages that generate the lessons of one outlined module"""
+    module = outline[index]
+    course_plan = "\n".join(f"{i+1}. {m['title']}" for i, m in enumerate(outline))
+    system_message = f"""You are an expert curriculum designer with expertise in creating engaging, structured learning experiences.
+
+You are writing one module of a course on "{course.subject}" tailored specifically for {course.learning_style} learners at a {course.difficulty_level} level with a {course.pace} pace.
+
+The content must be formatted with proper HTML tags for rich rendering. Use <h3>, <p>, <ul>, <li>, <code>, <pre>, <em>, <strong> tags appropriately to enhance readability and visual structure.
+
+Your response must be in valid JSON format with the exact structure specified in the user's message.
+"""
+    
+    user_message = f"""
+The course "{course.title}" has the following modules:
+{course_plan}
+
+Write module {index+1}: "{module['title']}"{f" ({module['summary']})" if module.get('summary') else ""}.
+
+Return ONLY a valid JSON object with the following structure:
+
+{{
+  "lessons": [
+    {{
+      "title": "Lesson Title",
+      "content": "<p>Detailed HTML-formatted lesson content with rich explanations, examples, and visuals.</p><h3>Section Heading</h3><p>More detailed content...</p>",
+      "interactive_elements": "<div class='interactive-exercise'><p>Instructions for the interactive exercise...</p></div>",
+      "knowledge_checks": [
+        {{
+          "type": "multiple_choice",
+          "question": "Detailed question text?",
+          "options": ["Option A", "Option B", "Option C", "Option D"],
+          "correct_answer": "Option A"
+        }}
+      ]
+    }}
+  ]
+}}
+
+Key requirements:
+
+1. Create {COURSE_LESSONS_PER_MODULE} lessons that build on the previous modules
+2. Each lesson must include:
+   - Detailed HTML-formatted content with proper section headings
+   - At least one interactive element for practice
+   - 3 multiple-choice knowledge check questions
+
+DO NOT include any explanatory text before or after the JSON. Return ONLY valid JSON.
+"""
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message}
+    ]
+
+def load_json_response(text: str, collect_key: str = None):
+    """Parse a JSON completion tolerating code fences and truncation; None on failure"""
+    return parse_tolerant_json(text, collect_key)[0]
+
+async def generate_course_outline(course: CourseCreate, user_id: int):
+    """Ask for the module titles of a course"""
+    outline_content = await llm_client.chat(
+        messages=build_outline_messages(course),
+        user_id=user_id,
+        temperature=0.5,
+        max_tokens=800,
+        timeout=LLM_TIMEOUT_GENERATE
+    )
+    outline = load_json_response(outline_content) or {}
+    modules = outline.get("modules") if isinstance(outline, dict) else None
+    if not isinstance(modules, list):
+        # Treated like any other upstream failure so callers fall back
+        raise LLMError("Course outline response was not valid JSON")
+    
+    return [
+        {"title": m.get("title") or f"Module {i+1}", "summary": m.get("summary", "")}
+        if isinstance(m, dict) else {"title": str(m), "summary": ""}
+        for i, m in enumerate(modules)
+    ]
+
+async def generate_course_module(course: CourseCreate, outline, index: int, semaphore: asyncio.Semaphore, user_id: int):
+    """Generate the lessons of one module; returns (index, module)"""
+    module = {"title": outline[index]["title"]}
+    async with semaphore:
         try:
-            content_json = json.loads(course_content)
-        except json.JSONDecodeError as e:
-            print(f"JSON parse error: {e}")
-            
-            # Try to extract JSON if wrapped in code blocks
-            match = re.search(r'```json\s*([\s\S]*?)\s*```', course_content)
-            if match:
-                try:
-                    content_json = json.loads(match.group(1))
-                except json.JSONDecodeError as inner_e:
-                    print(f"Failed to parse JSON from code block: {inner_e}")
-                    # Try to clean up the JSON and retry
-                    cleaned_json = match.group(1).strip().replace('\n', '')
-                    try:
-                        content_json = json.loads(cleaned_json)
-                    except json.JSONDecodeError:
-                        # Fall back to default structure
-                        content_json = create_fallback_content(course)
-            else:
-                # If no code block, try to find JSON-like content with braces
-                try:
-                    # Find content between first { and last }
-                    json_match = re.search(r'({[\s\S]*})', course_content)
-                    if json_match:
-                        potential_json = json_match.group(1)
-                        content_json = json.loads(potential_json)
-                    else:
-                        content_json = create_fallback_content(course)
-                except:
-                    content_json = create_fallback_content(course)
-        
-        # Validate and enrich the structure if needed
-        content_json = validate_course_structure(content_json, course)
-        
-        # Convert content to string for database storage
-        content_string = json.dumps(content_json)
-        
-        # Create the course in the database
-        db_course = models.Course(
-            title=course.title,
-            subject=course.subject,
-            difficulty_level=course.difficulty_level,
-            learning_style=course.learning_style,
-            pace=course.pace,
-            content=content_string,
-            user_id=current_user.id
+            module_content = await llm_client.chat(
+                messages=build_module_messages(course, outline, index),
+                user_id=user_id,
+                timeout=LLM_TIMEOUT_COURSE,
+                **COURSE_COMPLETION_PARAMS
+            )
+        except LLMError as e:
+            # A failed module keeps its title; validate_course_structure adds a placeholder lesson
+            print(f"Module {index+1} generation failed: {e}")
+            return index, module
+    
+    parsed = load_json_response(module_content, collect_key="lessons")
+    if isinstance(parsed, dict) and isinstance(parsed.get("lessons"), list):
+        module["lessons"] = parsed["lessons"]
+    return index, module
+
+async def iter_fanout_modules(course: CourseCreate, user_id: int):
+    """Yield (index, module) pairs as each concurrently generated module finishes"""
+    outline = await generate_course_outline(course, user_id)
+    semaphore = asyncio.Semaphore(COURSE_MODULE_CONCURRENCY)
+    tasks = [
+        asyncio.create_task(generate_course_module(course, outline, i, semaphore, user_id))
+        for i in range(len(outline))
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def generate_course_fanout(course: CourseCreate, user_id: int):
+    """Two-phase generation: outline first, then every module's lessons in parallel"""
+    modules = {}
+    async for index, module in iter_fanout_modules(course, user_id):
+        modules[index] = module
+    return {"modules": [modules[i] for i in sorted(modules)]}
+
+def parse_course_content(course_content: str, course: CourseCreate, parser: IncrementalJSONParser = None):
+    """Extract and validate the course JSON from a raw completion.
+
+    ``parser`` may be one that already consumed the completion while it streamed.
+    """
+    if parser is None:
+        content_json, parser = parse_tolerant_json(course_content, collect_key="modules")
+    else:
+        content_json = parser.result()
+    
+    recovered = parser.items if parser is not None else []
+    if parser is not None and not parser.complete:
+        print(f"Course JSON was truncated; recovered {len(recovered)} complete modules")
+    
+    if not isinstance(content_json, dict) or not isinstance(content_json.get("modules"), list):
+        # Keep every fully parsed module even when the document as a whole is unusable
+        content_json = {"modules": recovered} if recovered else create_fallback_content(course)
+    
+    # Validate and enrich the structure if needed
+    content_json = validate_course_structure(content_json, course)
+    
+    return content_json
+
+def save_course(db: Session, course: CourseCreate, content_json, user_id: int):
+    """Persist a generated course structure as module and lesson rows"""
+    overview, modules = build_modules(content_json)
+    
+    # Create the course in the database
+    db_course = models.Course(
+        title=course.title,
+        subject=course.subject,
+        difficulty_level=course.difficulty_level,
+        learning_style=course.learning_style,
+        pace=course.pace,
+        content=json.dumps(overview),
+        modules=modules,
+        module_count=len(modules),
+        user_id=user_id
+    )
+    
+    db.add(db_course)
+    db.commit()
+    dashboard_cache.invalidate(user_id)
+    db.refresh(db_course)
+    
+    return db_course
+
+async def generate_course_content(course: CourseCreate, user_id: int):
+    """Generate, parse and validate the content of a course"""
+    key = make_cache_key("course", DEFAULT_MODEL, COURSE_GENERATION_STRATEGY, course.dict())
+    if COURSE_GENERATION_STRATEGY == "fanout":
+        content = await single_flight.do(key, lambda: generate_course_fanout(course, user_id))
+        # Coalesced callers share the result, so validate a private copy
+        return validate_course_structure(copy.deepcopy(content), course)
+    
+    # Make the API call with increased max_tokens and adjusted temperature.
+    # Concurrent requests for an identical course share one upstream call,
+    # queued and charged under the user whose request started it.
+    course_content = await single_flight.do(
+        key,
+        lambda: llm_client.chat(
+            messages=build_course_messages(course),
+            user_id=user_id,
+            timeout=LLM_TIMEOUT_COURSE,
+            **COURSE_COMPLETION_PARAMS
         )
+    )
+    
+    print(f"AI Response: {course_content[:500]}...")  # Log first part of response
+    
+    return parse_course_content(course_content, course)
+
+async def run_course_job(payload: dict, user_id: int):
+    """Background job handler: generate a course and return its id"""
+    course = CourseCreate(**payload)
+    content_json = await generate_course_content(course, user_id)
+    return (await asyncio.to_thread(persist_course, course, content_json, user_id)).id
+
+job_executor.register("course", run_course_job)
+
+def course_response(course) -> CourseResponse:
+    """Serialize a course with its modules reassembled into the content document"""
+    response = CourseResponse.model_validate(course)
+    response.content = course_document(course)
+    return response
+
+def persist_course(course: CourseCreate, content_json, user_id: int) -> CourseResponse:
+    """Save a generated course in its own session and serialize it; blocking, so callers use asyncio.to_thread"""
+    db = SessionLocal()
+    try:
+        # Serialized before the session closes, since the modules load lazily
+        return course_response(save_course(db, course, content_json, user_id))
+    finally:
+        db.close()
+
+def with_course_structure(stmt):
+    return stmt.options(selectinload(models.Course.modules).selectinload(models.CourseModule.lessons))
+
+def wants_async_job(http_request: Request, async_mode: bool) -> bool:
+    return async_mode or "respond-async" in http_request.headers.get("prefer", "")
+
+@app.post("/courses", response_model=CourseResponse)
+async def create_course(
+    course: CourseCreate,
+    http_request: Request,
+    current_user: User = Depends(get_current_user),
+    async_mode: bool = False
+):
+    if wants_event_stream(http_request):
+        return await create_course_stream(course, current_user)
+    
+    try:
+        # Check if OpenAI API key is set
+        if not llm_client.is_configured():
+            raise HTTPException(
+                status_code=500,
+                detail="OpenAI API key not configured"
+            )
         
-        db.add(db_course)
-        db.commit()
-        db.refresh(db_course)
+        # Optionally hand the generation to the background workers and return at once
+        if wants_async_job(http_request, async_mode):
+            job = await job_executor.submit("course", course.dict(), current_user.id)
+            return JSONResponse(
+                status_code=202,
+                content={"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}
+            )
         
-        return db_course
+        try:
+            content_json = await generate_course_content(course, current_user.id)
+        except LLMError as e:
+            if not COURSE_FALLBACK_ON_ERROR:
+                raise
+            # Save the placeholder structure rather than failing the request outright
+            print(f"Course generation failed, saving fallback content: {str(e)}")
+            saved = await asyncio.to_thread(
+                persist_course, course, validate_course_structure(create_fallback_content(course), course), current_user.id
+            )
+            return JSONResponse(
+                content=jsonable_encoder(saved),
+                headers={"X-Generation-Degraded": "fallback"}
+            )
+        return await asyncio.to_thread(persist_course, course, content_json, current_user.id)
         
-    except openai.error.OpenAIError as e:
+    except LLMError as e:
         raise HTTPException(
             status_code=503,
             detail=f"Failed to generate course content: {str(e)}"
@@ -1376,12 +1991,99 @@ DO NOT include any explanatory text before or after the JSON. Return ONLY valid
     except Exception as e:
         print(f"Error in course creation: {str(e)}")
         traceback.print_exc()
-        db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Error creating course: {str(e)}"
         )
 
+async def stream_course_generation(course: CourseCreate, user_id: int):
+    """Emit each module as soon as its JSON is complete, then persist the course"""
+    try:
+        try:
+            if COURSE_GENERATION_STRATEGY == "fanout":
+                # Modules finish out of order; "index" gives each one's position in the course
+                modules = {}
+                async for index, module in iter_fanout_modules(course, user_id):
+                    modules[index] = module
+                    yield sse_event({"index": index, "module": module}, event="module")
+                content_json = validate_course_structure(
+                    {"modules": [modules[i] for i in sorted(modules)]}, course
+                )
+            else:
+                parser = IncrementalJSONParser(collect_key="modules")
+                module_index = 0
+                async for token in llm_client.stream_chat(
+                    messages=build_course_messages(course),
+                    user_id=user_id,
+                    timeout=LLM_TIMEOUT_COURSE,
+                    **COURSE_COMPLETION_PARAMS
+                ):
+                    for module in parser.feed(token):
+                        yield sse_event({"index": module_index, "module": module}, event="module")
+                        module_index += 1
+                content_json = parse_course_content(parser.text, course, parser)
+        except LLMError as e:
+            if not COURSE_FALLBACK_ON_ERROR:
+                raise
+            # Same placeholder course as the non-streaming path; "degraded" mirrors its X-Generation-Degraded header
+            print(f"Course generation failed, saving fallback content: {str(e)}")
+            yield sse_event({"mode": "fallback", "detail": str(e)}, event="degraded")
+            content_json = validate_course_structure(create_fallback_content(course), course)
+        
+        # Persist the final document exactly as the non-streaming path does
+        saved = await asyncio.to_thread(persist_course, course, content_json, user_id)
+        yield sse_event(jsonable_encoder(saved), event="course")
+    except Exception as e:
+        print(f"Error in streamed course creation: {str(e)}")
+        traceback.print_exc()
+        yield sse_event({"detail": str(e)}, event="error")
+
+@app.post("/courses/stream")
+async def create_course_stream(
+    course: CourseCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream course generation as Server-Sent Events"""
+    if not llm_client.is_configured():
+        raise HTTPException(
+            status_code=500,
+            detail="OpenAI API key not configured"
+        )
+    return StreamingResponse(
+        stream_course_generation(course, current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    job = await db.scalar(select(models.GenerationJob).filter(
+        models.GenerationJob.id == job_id,
+        models.GenerationJob.user_id == current_user.id
+    ))
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    result = None
+    if job.status == "succeeded" and job.job_type == "course" and job.result_id:
+        result = await db.scalar(with_course_structure(select(models.Course)).filter(models.Course.id == job.result_id))
+    
+    return JobResponse(
+        id=job.id,
+        job_type=job.job_type,
+        status=job.status,
+        result_id=job.result_id,
+        result=course_response(result) if result else None,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at
+    )
+
 def create_fallback_content(course):
     """Create a minimal course structure if AI generation fails"""
     return {
@@ -1442,30 +2144,99 @@ def validate_course_structure(content, course):
     
     return content
 
-# Update your get_courses endpoint to handle JSON parsing if needed
 @app.get("/courses/{course_id}", response_model=CourseResponse)
-def get_course(
+async def get_course(
     course_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    course = db.query(models.Course).filter(
+    """Full course document, assembled from its module and lesson rows"""
+    course = await db.scalar(with_course_structure(select(models.Course)).filter(
         models.Course.id == course_id,
         models.Course.user_id == current_user.id
-    ).first()
+    ))
     
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    return course
+    return course_response(course)
 
-@app.post("/quizzes/generate", response_model=QuizResponse)
-def generate_quiz(
-    quiz_data: dict,
+@app.get("/courses/{course_id}/outline", response_model=CourseOutlineResponse)
+async def get_course_outline(
+    course_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Generate a quiz based on specific topics or to address knowledge gaps"""
+    """Module and lesson titles only, without any lesson content"""
+    course = await db.scalar(select(models.Course).options(load_only(
+        models.Course.id, models.Course.title, models.Course.subject, models.Course.difficulty_level,
+        models.Course.learning_style, models.Course.pace, models.Course.created_at
+    )).filter(
+        models.Course.id == course_id,
+        models.Course.user_id == current_user.id
+    ))
+    
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    
+    rows = (await db.execute(
+        select(models.CourseModule.position, models.CourseModule.title,
+               models.CourseLesson.position, models.CourseLesson.title)
+        .outerjoin(models.CourseLesson, models.CourseLesson.module_id == models.CourseModule.id)
+        .filter(models.CourseModule.course_id == course_id)
+        .order_by(models.CourseModule.position, models.CourseLesson.position)
+    )).all()
+    
+    modules = {}
+    for module_index, module_title, lesson_index, lesson_title in rows:
+        module = modules.setdefault(module_index, ModuleOutline(index=module_index, title=module_title))
+        if lesson_index is not None:
+            module.lessons.append(LessonOutline(index=lesson_index, title=lesson_title))
+    
+    return CourseOutlineResponse(
+        id=course.id,
+        title=course.title,
+        subject=course.subject,
+        difficulty_level=course.difficulty_level,
+        learning_style=course.learning_style,
+        pace=course.pace,
+        created_at=course.created_at,
+        modules=list(modules.values())
+    )
+
+@app.get("/courses/{course_id}/modules/{module_index}/lessons/{lesson_index}", response_model=CourseLessonResponse)
+async def get_course_lesson(
+    course_id: int,
+    module_index: int,
+    lesson_index: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """A single lesson, addressed by zero-based module and lesson positions"""
+    lesson = await db.scalar(
+        select(models.CourseLesson)
+        .join(models.CourseModule, models.CourseLesson.module_id == models.CourseModule.id)
+        .join(models.Course, models.CourseModule.course_id == models.Course.id)
+        .filter(
+            models.Course.id == course_id,
+            models.Course.user_id == current_user.id,
+            models.CourseModule.position == module_index,
+            models.CourseLesson.position == lesson_index
+        )
+    )
+    
+    if not lesson:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    
+    return CourseLessonResponse(
+        course_id=course_id,
+        module_index=module_index,
+        index=lesson_index,
+        lesson=lesson_document(lesson)
+    )
+
+def build_quiz_messages(quiz_data: dict):
+    """Build the chat messages for a quiz targeting topics and knowledge gaps"""
     system_message = """You are an expert in creating educational assessments. 
     Create a quiz that targets specific knowledge gaps and reinforces understanding."""
     
@@ -1490,41 +2261,68 @@ def generate_quiz(
     }}
     """
     
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.7
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message}
+    ]
+
+async def generate_quiz_content(quiz_data: dict, user_id: int, cache_control: Optional[str] = None):
+    """Generate (or serve from the cache) the questions of a quiz"""
+    messages = build_quiz_messages(quiz_data)
+    
+    async def generate():
+        response_content = await llm_client.chat(
+            messages=messages,
+            user_id=user_id,
+            temperature=0.7,
+            timeout=LLM_TIMEOUT_GENERATE
         )
+        return json.loads(response_content)
+    
+    cache_parameters = {
+        "subject": quiz_data.get('subject'),
+        "difficulty_level": quiz_data.get('difficulty_level'),
+        "topics": quiz_data.get('topics', []),
+        "knowledge_gaps": quiz_data.get('knowledge_gaps', [])
+    }
+    return await cached_generation("quiz", cache_parameters, cache_control, generate)
+
+def build_quiz_record(quiz_data: dict, quiz_content, user_id: int):
+    return models.Quiz(
+        title=quiz_data.get('title', 'Generated Quiz'),
+        course_id=quiz_data.get('course_id'),
+        questions=quiz_content['questions'],
+        question_count=item_count(quiz_content['questions']),
+        difficulty_level=quiz_data.get('difficulty_level', 'medium'),
+        target_knowledge_gaps=quiz_data.get('knowledge_gaps', []),
+        user_id=user_id
+    )
+
+@app.post("/quizzes/generate", response_model=QuizResponse)
+async def generate_quiz(
+    quiz_data: dict,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    cache_control: Optional[str] = Header(None)
+):
+    """Generate a quiz based on specific topics or to address knowledge gaps"""
+    try:
+        quiz_content = await generate_quiz_content(quiz_data, current_user.id, cache_control)
         
-        quiz_content = json.loads(response.choices[0].message.content)
-        
-        db_quiz = models.Quiz(
-            title=quiz_data.get('title', 'Generated Quiz'),
-            course_id=quiz_data.get('course_id'),
-            questions=json.dumps(quiz_content['questions']),
-            difficulty_level=quiz_data.get('difficulty_level', 'medium'),
-            target_knowledge_gaps=json.dumps(quiz_data.get('knowledge_gaps', [])),
-            user_id=current_user.id
-        )
+        db_quiz = build_quiz_record(quiz_data, quiz_content, current_user.id)
         db.add(db_quiz)
-        db.commit()
-        db.refresh(db_quiz)
+        await db.commit()
+        dashboard_cache.invalidate(current_user.id)
+        await db.refresh(db_quiz)
         return db_quiz
         
+    except LLMError as e:
+        raise HTTPException(status_code=503, detail=f"Quiz generation unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/flashcards/generate", response_model=FlashcardResponse)
-def generate_flashcards(
-    data: dict,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Generate flashcards from content or for specific topics"""
+def build_flashcard_messages(data: dict):
+    """Build the chat messages for a flashcard set from content or topics"""
     system_message = """You are an expert in creating educational flashcards. 
     Create clear, concise flashcards that help with memorization and understanding."""
     
@@ -1549,46 +2347,270 @@ def generate_flashcards(
     }}
     """
     
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.7
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message}
+    ]
+
+async def generate_flashcard_content(data: dict, user_id: int, cache_control: Optional[str] = None):
+    """Generate (or serve from the cache) the cards of a flashcard set"""
+    messages = build_flashcard_messages(data)
+    
+    async def generate():
+        response_content = await llm_client.chat(
+            messages=messages,
+            user_id=user_id,
+            temperature=0.7,
+            timeout=LLM_TIMEOUT_GENERATE
         )
+        return json.loads(response_content)
+    
+    cache_parameters = {"content": data.get('content', ''), "topics": data.get('topics', [])}
+    return await cached_generation("flashcards", cache_parameters, cache_control, generate)
+
+def build_flashcard_record(data: dict, flashcard_content, user_id: int):
+    return models.FlashcardSet(
+        title=data.get('title', 'Generated Flashcards'),
+        course_id=data.get('course_id'),
+        cards=flashcard_content['cards'],
+        card_count=item_count(flashcard_content['cards']),
+        user_id=user_id
+    )
+
+@app.post("/flashcards/generate", response_model=FlashcardResponse)
+async def generate_flashcards(
+    data: dict,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    cache_control: Optional[str] = Header(None)
+):
+    """Generate flashcards from content or for specific topics"""
+    try:
+        flashcard_content = await generate_flashcard_content(data, current_user.id, cache_control)
         
-        flashcard_content = json.loads(response.choices[0].message.content)
-        
-        db_flashcard_set = models.FlashcardSet(
-            title=data.get('title', 'Generated Flashcards'),
-            course_id=data.get('course_id'),
-            cards=json.dumps(flashcard_content['cards']),
-            user_id=current_user.id
-        )
+        db_flashcard_set = build_flashcard_record(data, flashcard_content, current_user.id)
         db.add(db_flashcard_set)
-        db.commit()
-        db.refresh(db_flashcard_set)
+        await db.commit()
+        dashboard_cache.invalidate(current_user.id)
+        await db.refresh(db_flashcard_set)
         return db_flashcard_set
         
+    except LLMError as e:
+        raise HTTPException(status_code=503, detail=f"Flashcard generation unavailable: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def analyze_emotion(text: str) -> str:
+# ----- Batch generation -----
+
+BATCH_TOOL_TYPES = ("lesson_plan", "assessment", "activity", "quiz", "flashcards")
+# Parameters a saved record needs to be served by its list endpoint; checked before generating
+BATCH_REQUIRED_PARAMS = {
+    "lesson_plan": ("subject", "grade_level"),
+    "assessment": ("subject", "grade_level"),
+    "activity": ("activity_type",),
+}
+
+def as_string_list(value):
+    if isinstance(value, str):
+        return [value] if value else []
+    return list(value or [])
+
+async def generate_batch_item(item: BatchItem, user_id: int, cache_control: Optional[str]):
+    if item.tool_type == "quiz":
+        return await generate_quiz_content(item.parameters, user_id, cache_control)
+    if item.tool_type == "flashcards":
+        return await generate_flashcard_content(item.parameters, user_id, cache_control)
+    return await generate_ai_content(item, user_id, cache_control)
+
+def missing_batch_params(item: BatchItem) -> list:
+    return [name for name in BATCH_REQUIRED_PARAMS.get(item.tool_type, ()) if not item.parameters.get(name)]
+
+def build_batch_record(item: BatchItem, content, user_id: int):
+    """Map a generated batch item onto the model its single-item endpoint saves"""
+    params = item.parameters
+    topic = params.get('topic') or params.get('subject') or "Untitled"
+    if item.tool_type == "quiz":
+        return build_quiz_record({**params, "title": item.title or params.get('title', 'Generated Quiz')}, content, user_id)
+    if item.tool_type == "flashcards":
+        return build_flashcard_record({**params, "title": item.title or params.get('title', 'Generated Flashcards')}, content, user_id)
+    if item.tool_type == "lesson_plan":
+        return models.LessonPlan(
+            title=item.title or f"{topic} Lesson Plan",
+            subject=params.get('subject'),
+            grade_level=params.get('grade_level'),
+            duration=str(params.get('duration') or ""),
+            objectives=as_string_list(params.get('objectives')),
+            materials=as_string_list(params.get('materials')),
+            content=content,
+            user_id=user_id
+        )
+    if item.tool_type == "assessment":
+        return models.Assessment(
+            title=item.title or f"{topic} {params.get('assessment_type', 'quiz').title()}",
+            assessment_type=params.get('assessment_type', 'quiz'),
+            subject=params.get('subject'),
+            grade_level=params.get('grade_level'),
+            content=content,
+            user_id=user_id
+        )
+    return models.Activity(
+        title=item.title or topic,
+        activity_type=params.get('activity_type'),
+        description=params.get('description', ''),
+        duration=str(params.get('duration') or ""),
+        materials=json.dumps(as_string_list(params.get('materials'))),
+        instructions=content,
+        user_id=user_id
+    )
+
+def save_batch_records(pending):
+    """Insert a group of generated records in one transaction; returns (index, id) pairs"""
+    db = SessionLocal()
+    try:
+        db.add_all([record for _, record in pending])
+        # Flush to assign ids before commit expires the instances
+        db.flush()
+        saved = [
+            {"index": index, "id": record.id}
+            for indices, record in pending
+            for index in indices
+        ]
+        db.commit()
+        for user_id in {record.user_id for _, record in pending}:
+            dashboard_cache.invalidate(user_id)
+        return saved
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def save_batch_group(pending) -> dict:
+    """Commit one group of records off the event loop and describe the outcome as a "saved" line.
+
+    A failed group is reported by its item indices; generation and later groups carry on.
+    """
+    try:
+        return {"event": "saved", "status": "ok", "items": await asyncio.to_thread(save_batch_records, pending)}
+    except Exception as e:
+        print(f"Error saving batch records: {str(e)}")
+        traceback.print_exc()
+        return {
+            "event": "saved", "status": "error",
+            "indices": [index for indices, _ in pending for index in indices],
+            "detail": str(e)
+        }
+
+def ndjson_line(data) -> str:
+    return json.dumps(jsonable_encoder(data)) + "\n"
+
+async def stream_batch_generation(batch: BatchGenerateRequest, user_id: int, cache_control: Optional[str]):
+    """Generate every item with bounded concurrency and emit one NDJSON line per
+    result as it finishes, followed by "saved" lines as records are committed"""
+    # Identical items are generated (and saved) once and reported under every index
+    groups = {}
+    failed = 0
+    for index, item in enumerate(batch.items):
+        detail = None
+        if item.tool_type not in BATCH_TOOL_TYPES:
+            detail = f"Tool type '{item.tool_type}' not supported"
+        elif batch.persist and missing_batch_params(item):
+            # Rejected before paying for a generation that could not be saved
+            detail = f"Missing parameters: {', '.join(missing_batch_params(item))}"
+        if detail:
+            failed += 1
+            yield ndjson_line({
+                "event": "item", "index": index, "tool_type": item.tool_type, "status": "error",
+                "detail": detail
+            })
+            continue
+        groups.setdefault(generation_cache_key(item.tool_type, item.parameters), []).append(index)
+    
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def run(indices):
+        item = batch.items[indices[0]]
+        async with semaphore:
+            try:
+                return indices, await generate_batch_item(item, user_id, cache_control), None
+            except HTTPException as e:
+                return indices, None, e.detail
+            except Exception as e:
+                return indices, None, str(e)
+    
+    tasks = [asyncio.ensure_future(run(indices)) for indices in groups.values()]
+    pending, succeeded = [], 0
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            indices, content, error = await next_result
+            for index in indices:
+                line = {
+                    "event": "item",
+                    "index": index,
+                    "tool_type": batch.items[index].tool_type,
+                    "status": "error" if error else "ok",
+                    "duplicate_of": indices[0] if index != indices[0] else None
+                }
+                if error:
+                    line["detail"] = error
+                    failed += 1
+                else:
+                    line["content"] = content
+                    succeeded += 1
+                yield ndjson_line(line)
+            
+            if content is not None and batch.persist:
+                try:
+                    pending.append((indices, build_batch_record(batch.items[indices[0]], content, user_id)))
+                except (KeyError, TypeError) as e:
+                    yield ndjson_line({"event": "saved", "status": "error", "indices": indices, "detail": str(e)})
+            if len(pending) >= BATCH_COMMIT_SIZE:
+                yield ndjson_line(await save_batch_group(pending))
+                pending = []
+        
+        if pending:
+            yield ndjson_line(await save_batch_group(pending))
+    except Exception as e:
+        print(f"Error in batch generation: {str(e)}")
+        traceback.print_exc()
+        yield ndjson_line({"event": "error", "detail": str(e)})
+    finally:
+        # The client went away: stop generating items nobody will receive
+        for task in tasks:
+            task.cancel()
+    
+    yield ndjson_line({
+        "event": "done",
+        "total": len(batch.items),
+        "unique": len(groups),
+        "succeeded": succeeded,
+        "failed": failed
+    })
+
+@app.post("/batch/generate")
+async def batch_generate(
+    batch: BatchGenerateRequest,
+    current_user: User = Depends(get_current_user),
+    cache_control: Optional[str] = Header(None)
+):
+    """Generate many lesson plans, assessments, activities, quizzes and flashcard
+    sets in one request, streaming newline-delimited JSON results"""
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="Batch contains no items")
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds the limit of {BATCH_MAX_ITEMS} items"
+        )
+    return StreamingResponse(
+        stream_batch_generation(batch, current_user.id, cache_control),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}
+    )
+
+async def analyze_emotion(text: str) -> str:
     try:
-        transformer_result = emotion_classifier(text)[0]
-        blob = TextBlob(text)
-        polarity = blob.sentiment.polarity
-
-        if transformer_result['score'] > 0.6:
-            return transformer_result['label'].lower()
-        elif polarity < -0.3:
-            return "stressed"
-        elif polarity > 0.3:
-            return "confident"
-        else:
-            return "neutral"
+        return await detect_emotion(text)
     except Exception as e:
         print("Emotion detection error:", e)
         raise HTTPException(status_code=500, detail=f"Emotion detection failed: {e}")
@@ -1601,73 +2623,142 @@ PROMPT_TEMPLATES = {
     "neutral": "You are a helpful tutor. Provide a clear and concise explanation. Question: {question}",
 }
 
-async def generate_response(user_input: str, emotion: str) -> str:
+async def generate_response(user_input: str, emotion: str, caller: str) -> str:
     prompt = PROMPT_TEMPLATES.get(emotion, PROMPT_TEMPLATES['neutral']).format(question=user_input)
     try:
-        completion = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
+        completion = await llm_client.chat(
             messages=[
                 {"role": "system", "content": "You are a helpful educational assistant."},
                 {"role": "user", "content": prompt}
-            ]
+            ],
+            user_id=caller,
+            lane=LANE_INTERACTIVE,
+            timeout=LLM_TIMEOUT_CHAT
         )
-        return completion.choices[0].message["content"].strip()
+        return completion.strip()
+    except LLMError as e:
+        print("GPT generation unavailable, sending fallback reply:", e)
+        return TUTOR_FALLBACK_RESPONSE
     except Exception as e:
         print("GPT generation error:", e)
         raise HTTPException(status_code=500, detail=f"GPT generation failed: {e}")
 
+@app.post("/chat/emotion-aware", response_model=ChatResponse)
+async def emotion_aware_chat(req: ChatRequest, caller: str = Depends(get_caller_key)):
+    print(f"Received input: {req.user_input}")
+    sentiment = await analyze_emotion(req.user_input)
+    print(f"Detected sentiment: {sentiment}")
+    gpt_response = await generate_response(req.user_input, sentiment, caller)
+    print(f"GPT response: {gpt_response}")
+    return ChatResponse(sentiment=sentiment, response=gpt_response)
+
 # Add these endpoints to your main.py
 
 @app.get("/courses", response_model=List[CourseResponse])
-def get_courses(
+async def get_courses(
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None
 ):
-    courses = db.query(models.Course).filter(
+    """List courses; ?fields= returns only those CourseSummary fields"""
+    names = requested_fields(fields, CourseSummary)
+    stmt = select(models.Course).filter(
         models.Course.user_id == current_user.id
-    ).all()
-    return courses
+    )
+    if names:
+        courses = await list_page(db, response, load_fields(stmt, models.Course, names), models.Course, cursor, skip, limit)
+        return sparse_response(response, courses, CourseSummary, names)
+    courses = await list_page(db, response, with_course_structure(stmt), models.Course, cursor, skip, limit)
+    return [course_response(course) for course in courses]
 
 @app.get("/quizzes", response_model=List[QuizResponse])
-def get_quizzes(
+async def get_quizzes(
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None
 ):
-    quizzes = db.query(models.Quiz).filter(
+    """List quizzes; ?fields= returns only those QuizSummary fields"""
+    names = requested_fields(fields, QuizSummary)
+    stmt = select(models.Quiz).filter(
         models.Quiz.user_id == current_user.id
-    ).all()
+    )
+    if names:
+        stmt = load_fields(stmt, models.Quiz, names)
+    quizzes = await list_page(db, response, stmt, models.Quiz, cursor, skip, limit)
+    if names:
+        return sparse_response(response, quizzes, QuizSummary, names)
     return quizzes
 
 @app.get("/flashcards", response_model=List[FlashcardResponse])
-def get_flashcards(
+async def get_flashcards(
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: Optional[int] = Query(None, ge=1),
+    min_cards: Optional[int] = None,
+    fields: Optional[str] = None
 ):
-    flashcards = db.query(models.FlashcardSet).filter(
+    """List flashcard sets, optionally only those with at least min_cards cards.
+
+    ?fields= returns only those FlashcardSetSummary fields.
+    """
+    names = requested_fields(fields, FlashcardSetSummary)
+    stmt = select(models.FlashcardSet).filter(
         models.FlashcardSet.user_id == current_user.id
-    ).all()
+    )
+    if min_cards is not None:
+        stmt = stmt.filter(models.FlashcardSet.card_count >= min_cards)
+    if names:
+        stmt = load_fields(stmt, models.FlashcardSet, names)
+    flashcards = await list_page(db, response, stmt, models.FlashcardSet, cursor, skip, limit)
+    if names:
+        return sparse_response(response, flashcards, FlashcardSetSummary, names)
     return flashcards
 
+@app.get("/dashboard/summary", response_model=DashboardSummary)
+async def get_dashboard_summary(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    recent: int = Query(5, ge=1, le=DASHBOARD_RECENT_MAX)
+):
+    """Everything the dashboard shows in one request, cached per user until their content changes"""
+    summary = dashboard_cache.get(current_user.id, recent)
+    if summary is None:
+        version = dashboard_cache.version(current_user.id)
+        summary = await build_summary(db, current_user.id, recent)
+        dashboard_cache.set(current_user.id, recent, summary, version)
+    return summary
+
 @app.get("/courses/{course_id}/progress", response_model=Dict)
-def get_course_progress(
+async def get_course_progress(
     course_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if course exists and belongs to user
-    course = db.query(models.Course).filter(
+    course = await db.scalar(select(models.Course).filter(
         models.Course.id == course_id,
         models.Course.user_id == current_user.id
-    ).first()
+    ))
     
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
     # Get or create progress record
-    progress = db.query(models.CourseProgress).filter(
+    progress = await db.scalar(select(models.CourseProgress).filter(
         models.CourseProgress.course_id == course_id,
         models.CourseProgress.user_id == current_user.id
-    ).first()
+    ))
     
     if not progress:
         # Initialize with empty progress
@@ -1675,47 +2766,39 @@ def get_course_progress(
             user_id=current_user.id,
             course_id=course_id,
             progress_percentage=0,
-            completed_modules=json.dumps([]),
+            completed_modules=[],
             current_module="0"
         )
         db.add(progress)
-        db.commit()
-        db.refresh(progress)
-    
-    # Convert JSON string to list if needed
-    completed_modules = progress.completed_modules
-    if isinstance(completed_modules, str):
-        try:
-            completed_modules = json.loads(completed_modules)
-        except:
-            completed_modules = []
+        await db.commit()
+        await db.refresh(progress)
     
     return {
-        "completed_modules": completed_modules,
+        "completed_modules": progress.completed_modules or [],
         "current_module": progress.current_module,
         "progress_percentage": progress.progress_percentage
     }
 @app.post("/courses/{course_id}/progress", response_model=Dict)
-def update_course_progress(
+async def update_course_progress(
     course_id: int,
     progress_data: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if course exists and belongs to user
-    course = db.query(models.Course).filter(
+    course = await db.scalar(select(models.Course).filter(
         models.Course.id == course_id,
         models.Course.user_id == current_user.id
-    ).first()
+    ))
     
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
     # Get or create progress record
-    progress = db.query(models.CourseProgress).filter(
+    progress = await db.scalar(select(models.CourseProgress).filter(
         models.CourseProgress.course_id == course_id,
         models.CourseProgress.user_id == current_user.id
-    ).first()
+    ))
     
     if not progress:
         progress = models.CourseProgress(
@@ -1727,7 +2810,9 @@ def update_course_progress(
     # Update progress fields
     if "completed_modules" in progress_data:
         completed_modules = progress_data["completed_modules"]
-        progress.completed_modules = json.dumps(completed_modules) if isinstance(completed_modules, list) else completed_modules
+        if isinstance(completed_modules, str):
+            completed_modules = json.loads(completed_modules)
+        progress.completed_modules = completed_modules
     
     if "current_module" in progress_data:
         progress.current_module = str(progress_data["current_module"])
@@ -1737,12 +2822,13 @@ def update_course_progress(
     
     progress.last_accessed = datetime.utcnow()
     
-    db.commit()
-    db.refresh(progress)
+    await db.commit()
+    dashboard_cache.invalidate(current_user.id)
+    await db.refresh(progress)
     
     # Return updated progress
     return {
-        "completed_modules": json.loads(progress.completed_modules) if isinstance(progress.completed_modules, str) else progress.completed_modules,
+        "completed_modules": progress.completed_modules or [],
         "current_module": progress.current_module,
         "progress_percentage": progress.progress_percentage
     }
@@ -1750,83 +2836,3 @@ def update_course_progress(
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
-
-
-from transformers import pipeline
-from textblob import TextBlob
-from pydantic import BaseModel
-from fastapi import HTTPException
-
-# Load OpenAI key from environment
-import openai, os
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-# Load HuggingFace model for emotion classification
-emotion_classifier = pipeline("text-classification", model="bhadresh-savani/distilbert-base-uncased-emotion")
-
-# Pydantic request/response models
-class ChatRequest(BaseModel):
-    user_input: str
-
-class ChatResponse(BaseModel):
-    sentiment: str
-    response: str
-
-# Emotion analysis function
-def analyze_emotion(text: str) -> str:
-    try:
-        transformer_result = emotion_classifier(text)[0]
-        blob = TextBlob(text)
-        polarity = blob.sentiment.polarity
-
-        if transformer_result['score'] > 0.6:
-            return transformer_result['label'].lower()
-        elif polarity < -0.3:
-            return "stressed"
-        elif polarity > 0.3:
-            return "confident"
-        else:
-            return "neutral"
-    except Exception as e:
-        print("Emotion detection error:", e)
-        raise HTTPException(status_code=500, detail=f"Emotion detection failed: {e}")
-
-# Prompt templates
-PROMPT_TEMPLATES = {
-    "stressed": "You are a kind and patient tutor. Explain slowly, offer encouragement, and make sure the student feels supported. Question: {question}",
-    "confident": "You are a challenging tutor. Ask deeper follow-up questions and encourage critical thinking. Question: {question}",
-    "disengaged": "You are a fun and energetic tutor. Use analogies, humor, or games to re-engage the student. Question: {question}",
-    "curious": "You are an inspiring tutor. Connect the topic to real-world ideas and exploration. Question: {question}",
-    "neutral": "You are a helpful tutor. Provide a clear and concise explanation. Question: {question}",
-}
-
-# GPT response generator
-async def generate_response(user_input: str, emotion: str) -> str:
-    prompt = PROMPT_TEMPLATES.get(emotion, PROMPT_TEMPLATES['neutral']).format(question=user_input)
-    try:
-        completion = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful educational assistant."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return completion.choices[0].message["content"].strip()
-    except Exception as e:
-        print("GPT generation error:", e)
-        raise HTTPException(status_code=500, detail=f"GPT generation failed: {e}")
-
-# FastAPI endpoint
-@app.post("/chat/emotion-aware", response_model=ChatResponse)
-async def emotion_aware_chat(req: ChatRequest):
-    print(f"Received input: {req.user_input}")
-    sentiment = analyze_emotion(req.user_input)
-    print(f"Detected sentiment: {sentiment}")
-    gpt_response = await generate_response(req.user_input, sentiment)
-    print(f"GPT response: {gpt_response}")
-    return ChatResponse(sentiment=sentiment, response=gpt_response)
-
-# Run the application with uvicorn
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
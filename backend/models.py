@@ -1,9 +1,14 @@
 # models.py
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, DateTime, Table, Float
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, DateTime, Table, Float, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
 
+# Structured fields are stored as JSON (JSONB on PostgreSQL) and decoded by the
+# column type; SQL NULL stays NULL instead of becoming the JSON literal null
+JSONType = JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql")
+
 class User(Base):
     __tablename__ = "users"
 
@@ -13,7 +18,7 @@ class User(Base):
     password = Column(String)
     school = Column(String, nullable=True)
     grade_level = Column(String, nullable=True)
-    subjects = Column(String, nullable=True)  # JSON string of subjects
+    subjects = Column(JSONType, nullable=True)  # list of subjects
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
@@ -28,14 +33,17 @@ class User(Base):
 
 class LessonPlan(Base):
     __tablename__ = "lesson_plans"
+    __table_args__ = (
+        Index("ix_lesson_plans_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
     subject = Column(String)
     grade_level = Column(String)
     duration = Column(String)
-    objectives = Column(String)  # JSON string of objectives
-    materials = Column(String)   # JSON string of materials
+    objectives = Column(JSONType)  # list of objectives
+    materials = Column(JSONType)   # list of materials
     content = Column(Text)
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -46,6 +54,9 @@ class LessonPlan(Base):
 
 class Assessment(Base):
     __tablename__ = "assessments"
+    __table_args__ = (
+        Index("ix_assessments_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
@@ -61,6 +72,10 @@ class Assessment(Base):
 
 class Activity(Base):
     __tablename__ = "activities"
+    __table_args__ = (
+        Index("ix_activities_user_created", "user_id", "created_at", "id"),
+        Index("ix_activities_lesson_plan", "lesson_plan_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
@@ -79,6 +94,9 @@ class Activity(Base):
 
 class Resource(Base):
     __tablename__ = "resources"
+    __table_args__ = (
+        Index("ix_resources_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String)
@@ -93,6 +111,9 @@ class Resource(Base):
 
 class Class(Base):
     __tablename__ = "classes"
+    __table_args__ = (
+        Index("ix_classes_teacher_created", "teacher_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
@@ -109,12 +130,16 @@ class Class(Base):
 
 class StudentRecord(Base):
     __tablename__ = "student_records"
+    __table_args__ = (
+        Index("ix_student_records_class_created", "class_id", "created_at", "id"),
+        Index("ix_student_records_user", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_name = Column(String)
     student_id = Column(String, nullable=True)
     notes = Column(Text, nullable=True)
-    performance_data = Column(Text, nullable=True)  # JSON string of performance data
+    performance_data = Column(JSONType, nullable=True)  # e.g. {"average": 82, ...}
     class_id = Column(Integer, ForeignKey("classes.id"))
     user_id = Column(Integer, ForeignKey("users.id"))  # teacher who created the record
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -125,14 +150,18 @@ class StudentRecord(Base):
 
 class Course(Base):
     __tablename__ = "courses"
+    __table_args__ = (
+        Index("ix_courses_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     subject = Column(String)
     difficulty_level = Column(String)
-    content = Column(Text)  # JSON string of course structure
+    content = Column(Text)  # JSON string of top-level course fields; modules live in course_modules
     learning_style = Column(String)  # Visual, Auditory, Kinesthetic
     pace = Column(String)  # Fast, Medium, Slow
+    module_count = Column(Integer)  # precomputed so list views skip the modules
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -141,16 +170,62 @@ class Course(Base):
     quizzes = relationship("Quiz", back_populates="course")
     flashcard_sets = relationship("FlashcardSet", back_populates="course")
     student_progress = relationship("CourseProgress", back_populates="course")
+    modules = relationship(
+        "CourseModule", back_populates="course", order_by="CourseModule.position",
+        cascade="all, delete-orphan"
+    )
+
+class CourseModule(Base):
+    __tablename__ = "course_modules"
+    __table_args__ = (
+        Index("ix_course_modules_course_position", "course_id", "position", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    position = Column(Integer, nullable=False)  # zero-based order within the course
+    title = Column(String)
+    extra = Column(JSONType)  # any other keys the generator returned for the module
+
+    # Relationships
+    course = relationship("Course", back_populates="modules")
+    lessons = relationship(
+        "CourseLesson", back_populates="module", order_by="CourseLesson.position",
+        cascade="all, delete-orphan"
+    )
+
+class CourseLesson(Base):
+    __tablename__ = "course_lessons"
+    __table_args__ = (
+        Index("ix_course_lessons_module_position", "module_id", "position", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    module_id = Column(Integer, ForeignKey("course_modules.id"), nullable=False)
+    position = Column(Integer, nullable=False)  # zero-based order within the module
+    title = Column(String)
+    content = Column(Text)  # HTML
+    interactive_elements = Column(Text)  # HTML
+    knowledge_checks = Column(JSONType)  # list of questions
+    extra = Column(JSONType)  # any other keys the generator returned for the lesson
+
+    # Relationships
+    module = relationship("CourseModule", back_populates="lessons")
 
 class Quiz(Base):
     __tablename__ = "quizzes"
+    __table_args__ = (
+        Index("ix_quizzes_user_created", "user_id", "created_at", "id"),
+        Index("ix_quizzes_course", "course_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
     course_id = Column(Integer, ForeignKey("courses.id"))
-    questions = Column(Text)  # JSON string of questions and answers
+    questions = Column(JSONType)  # list of questions and answers
     difficulty_level = Column(String)
-    target_knowledge_gaps = Column(String)  # JSON string of topics to focus on
+    target_knowledge_gaps = Column(JSONType)  # list of topics to focus on
+    question_count = Column(Integer)  # len(questions), set when questions are written
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -160,11 +235,16 @@ class Quiz(Base):
 
 class FlashcardSet(Base):
     __tablename__ = "flashcard_sets"
+    __table_args__ = (
+        Index("ix_flashcard_sets_user_created", "user_id", "created_at", "id"),
+        Index("ix_flashcard_sets_course", "course_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=True)
-    cards = Column(Text)  # JSON string of flashcards
+    cards = Column(JSONType)  # list of flashcards
+    card_count = Column(Integer)  # len(cards), set when cards are written
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -174,11 +254,14 @@ class FlashcardSet(Base):
 
 class ChatConversation(Base):
     __tablename__ = "chat_conversations"
+    __table_args__ = (
+        Index("ix_chat_conversations_user_created", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=True)
-    messages = Column(Text)  # JSON string of chat messages
+    messages = Column(JSONType)  # list of chat messages
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -188,12 +271,16 @@ class ChatConversation(Base):
 
 class CourseProgress(Base):
     __tablename__ = "course_progress"
+    __table_args__ = (
+        Index("ix_course_progress_course_user", "course_id", "user_id"),
+        Index("ix_course_progress_user", "user_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     course_id = Column(Integer, ForeignKey("courses.id"))
     progress_percentage = Column(Float, default=0.0)
-    completed_modules = Column(String)  # JSON array of completed module IDs
+    completed_modules = Column(JSONType)  # list of completed module IDs
     current_module = Column(String)
     last_accessed = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -204,6 +291,10 @@ class CourseProgress(Base):
 # Adding missing models referenced in relationships
 class QuizAttempt(Base):
     __tablename__ = "quiz_attempts"
+    __table_args__ = (
+        Index("ix_quiz_attempts_quiz_user", "quiz_id", "user_id"),
+        Index("ix_quiz_attempts_user_created", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     quiz_id = Column(Integer, ForeignKey("quizzes.id"))
@@ -218,6 +309,10 @@ class QuizAttempt(Base):
 
 class FlashcardReview(Base):
     __tablename__ = "flashcard_reviews"
+    __table_args__ = (
+        Index("ix_flashcard_reviews_set_user_card", "flashcard_set_id", "user_id", "card_index"),
+        Index("ix_flashcard_reviews_user_created", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     flashcard_set_id = Column(Integer, ForeignKey("flashcard_sets.id"))
@@ -228,4 +323,30 @@ class FlashcardReview(Base):
     
     # Relationships
     flashcard_set = relationship("FlashcardSet", back_populates="review_history")
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+
+    key = Column(String, primary_key=True)  # SHA-256 of the normalized request
+    tool_type = Column(String, index=True)
+    value = Column(Text)  # JSON encoded generation result
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime, index=True)
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id = Column(String, primary_key=True, index=True)  # UUID hex
+    job_type = Column(String)  # course
+    status = Column(String, default="queued", index=True)  # queued, running, succeeded, failed
+    payload = Column(Text)  # JSON string of the original request
+    result_id = Column(Integer, nullable=True)  # id of the record created by the job
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    user = relationship("User")
@@ -0,0 +1,76 @@
+# pagination.py
+"""Keyset pagination over (created_at, id).
+
+A page is fetched with ``WHERE (created_at, id) > (:created_at, :id) ORDER BY
+created_at, id LIMIT n``, so its cost depends on the page size rather than on
+how deep the client has scrolled. The position is handed out as an opaque
+cursor token; ``skip`` is still honoured for older clients. Endpoints that
+were never paged pass ``limit=None``, and a request without a cursor or a
+limit still gets every row.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import and_, func, literal, or_
+
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat() if created_at else None, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, row_id = json.loads(raw)
+        return (datetime.fromisoformat(created_at) if created_at else None), int(row_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def page_size(limit) -> int:
+    return max(1, min(limit or PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX))
+
+
+def after_cursor(model, created_at: datetime, row_id: int, dialect: str):
+    """Rows strictly after the cursor position in (created_at, id) order"""
+    if created_at is None:
+        return model.id > row_id
+    bound = literal(created_at, model.created_at.type)
+    if dialect == "sqlite":
+        # CURRENT_TIMESTAMP is stored without fractional seconds while bound
+        # datetimes carry them, so normalize before comparing for ties
+        bound = func.datetime(bound)
+    return or_(
+        model.created_at > bound,
+        and_(model.created_at == bound, model.id > row_id)
+    )
+
+
+async def fetch_page(db, stmt, model, cursor: str = None, skip: int = 0, limit: int = None):
+    """Run a select for one page; returns (rows, next_cursor or None)"""
+    stmt = stmt.order_by(model.created_at, model.id)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        stmt = stmt.filter(after_cursor(model, created_at, row_id, db.bind.dialect.name))
+    elif skip:
+        stmt = stmt.offset(skip)
+    if limit is None and not cursor:
+        return (await db.scalars(stmt)).all(), None
+    size = page_size(limit)
+    # One extra row tells whether another page exists
+    rows = (await db.scalars(stmt.limit(size + 1))).all()
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
@@ -0,0 +1,41 @@
+# singleflight.py
+import asyncio
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key onto one in-flight task.
+
+    The first caller starts the work; every identical caller that arrives
+    while it is running awaits the same task and receives the same result
+    (or exception). The task is shielded so a disconnecting client does not
+    cancel the upstream call for everyone else.
+
+    ``fn`` is the first caller's closure, so a shared LLM call is charged to
+    that caller's flow in the governor's fair queue; later callers spend no
+    queue share or token budget of their own.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.counters = {"executed": 0, "coalesced": 0}
+
+    async def do(self, key, fn):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+            self.counters["executed"] += 1
+        else:
+            self.counters["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self):
+        return {**self.counters, "in_flight": len(self._inflight)}
+
+
+single_flight = SingleFlight()
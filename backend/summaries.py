@@ -0,0 +1,85 @@
+# summaries.py
+"""Sparse fieldsets for list endpoints.
+
+``GET /quizzes?fields=title,question_count`` loads only the columns behind the
+requested fields (plus id and created_at, which the keyset cursor needs) and
+returns just those keys; ``fields=summary`` asks for every field of the
+resource's summary model. Summary models never include the heavy Text/JSON
+columns; their sizes live in count columns filled in at write time.
+"""
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import load_only
+
+import models
+
+SUMMARY = "summary"
+BACKFILL_BATCH = 500
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def item_count(value) -> int:
+    """Length of a stored JSON list; anything else counts as empty"""
+    return len(value) if isinstance(value, list) else 0
+
+
+def parse_fields(fields: str, summary_model) -> list:
+    """Validate a comma-separated ?fields= value against a summary model"""
+    allowed = list(summary_model.model_fields)
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    if not requested:
+        raise InvalidFields(f"fields must name at least one of: {', '.join(allowed)}")
+    if SUMMARY in requested:
+        return allowed
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise InvalidFields(f"Unknown fields: {', '.join(unknown)}; choose from: {', '.join(allowed)}")
+    return ["id"] + [name for name in dict.fromkeys(requested) if name != "id"]
+
+
+def load_fields(stmt, model, names):
+    """Restrict a select to the columns behind the requested fields"""
+    columns = dict.fromkeys(["id", "created_at", *names])
+    return stmt.options(load_only(*(getattr(model, name) for name in columns)))
+
+
+def summary_rows(rows, summary_model, names) -> list:
+    return [
+        summary_model(**{name: getattr(row, name) for name in names}).model_dump(mode="json", include=set(names))
+        for row in rows
+    ]
+
+
+def backfill_counts(session_factory) -> int:
+    """Fill count columns for rows written before they existed"""
+    filled = 0
+    db = session_factory()
+    try:
+        for model, source, target in (
+            (models.Quiz, models.Quiz.questions, models.Quiz.question_count),
+            (models.FlashcardSet, models.FlashcardSet.cards, models.FlashcardSet.card_count),
+        ):
+            while True:
+                rows = db.execute(
+                    select(model.id, source).filter(target.is_(None)).limit(BACKFILL_BATCH)
+                ).all()
+                if not rows:
+                    break
+                db.bulk_update_mappings(model, [{"id": row_id, target.key: item_count(value)} for row_id, value in rows])
+                db.commit()
+                filled += len(rows)
+        modules = (
+            select(func.count(models.CourseModule.id))
+            .filter(models.CourseModule.course_id == models.Course.id)
+            .scalar_subquery()
+        )
+        result = db.execute(
+            update(models.Course).filter(models.Course.module_count.is_(None)).values(module_count=modules),
+            execution_options={"synchronize_session": False}
+        )
+        db.commit()
+        return filled + result.rowcount
+    finally:
+        db.close()
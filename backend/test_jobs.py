@@ -0,0 +1,56 @@
+# test_jobs.py
+import os
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import jobs
+import models
+from database import Base, create_engine_for_url
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine_for_url(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(jobs, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+def add_job(factory, job_id, status, attempts, age):
+    db = factory()
+    db.add(models.GenerationJob(
+        id=job_id, job_type="course", status=status, payload="{}", attempts=attempts,
+        updated_at=datetime.utcnow() - age
+    ))
+    db.commit()
+    db.close()
+
+
+def statuses(factory):
+    db = factory()
+    try:
+        return {job.id: (job.status, job.error) for job in db.query(models.GenerationJob)}
+    finally:
+        db.close()
+
+
+def test_recover_fails_stale_jobs_out_of_attempts(session_factory, monkeypatch):
+    monkeypatch.setenv("JOB_MAX_ATTEMPTS", "3")
+    monkeypatch.setenv("JOB_STALE_SECONDS", "60")
+    executor = jobs.LocalJobExecutor()
+    add_job(session_factory, "exhausted", "running", 3, timedelta(minutes=5))
+    add_job(session_factory, "retry", "running", 2, timedelta(minutes=5))
+    add_job(session_factory, "alive", "running", 3, timedelta(seconds=5))
+    add_job(session_factory, "waiting", "queued", 0, timedelta(0))
+
+    assert sorted(executor._recover()) == ["retry", "waiting"]
+    result = statuses(session_factory)
+    assert result["exhausted"][0] == "failed" and "3 attempts" in result["exhausted"][1]
+    assert result["retry"] == ("queued", None)
+    assert result["alive"] == ("running", None)
@@ -16,7 +16,7 @@ const AiTutor = () => {
     // Fetch user's courses to provide context to the tutor
     const fetchCourses = async () => {
       try {
-        const response = await api.get('/courses');
+        const response = await api.get('/courses', { params: { fields: 'id,title' } });
         setCourses(response.data);
       } catch (error) {
         console.error('Error fetching courses:', error);
@@ -21,7 +21,7 @@ const Courses = () => {
   const fetchCourses = async () => {
     try {
       setIsLoading(true);
-      const response = await api.get('/courses');
+      const response = await api.get('/courses', { params: { fields: 'summary' } });
       setCourses(response.data);
       setIsLoading(false);
     } catch (error) {
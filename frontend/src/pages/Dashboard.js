@@ -1,10 +1,20 @@
 // src/pages/Dashboard.jsx
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { api } from '../services/api';
 import { useAuth } from '../contexts/AuthContext';
 import './Dashboard.css';
 
+// Labels and detail pages for the item types returned by /dashboard/summary
+const ITEM_TYPES = {
+  lesson_plan: { label: 'Lesson Plan', path: '/lesson-plans' },
+  assessment: { label: 'Assessment', path: '/assessments' },
+  course: { label: 'Course', path: '/courses' },
+  quiz: { label: 'Quiz', path: '/quizzes' },
+  flashcard_set: { label: 'Flashcards', path: '/flashcards' },
+  activity: { label: 'Activity', path: '/activities' }
+};
+
 const Dashboard = () => {
   const { user } = useAuth();
   const [stats, setStats] = useState({
@@ -25,110 +35,40 @@ const Dashboard = () => {
   });
   const [isLoading, setIsLoading] = useState(true);
 
-  // Helper function to determine item type
-  const getItemType = (item) => {
-    if ('objectives' in item && 'materials' in item) return 'Lesson Plan';
-    if ('assessment_type' in item) return 'Assessment';
-    if ('difficulty_level' in item && 'learning_style' in item) return 'Course';
-    if ('questions' in item) return 'Quiz';
-    if ('cards' in item) return 'Flashcards';
-    if ('activity_type' in item) return 'Activity';
-    if ('filename' in item) return 'Resource';
-    return 'Unknown';
-  };
-
-  // Helper function to get item path
-  const getItemPath = useCallback((item) => {
-    const type = getItemType(item);
-    switch (type) {
-      case 'Lesson Plan': return `/lesson-plans/${item.id}`;
-      case 'Assessment': return `/assessments/${item.id}`;
-      case 'Course': return `/courses/${item.id}`;
-      case 'Quiz': return `/quizzes/${item.id}`;
-      case 'Flashcards': return `/flashcards/${item.id}`;
-      case 'Activity': return `/activities/${item.id}`;
-      case 'Resource': return `/resources/${item.id}`;
-      default: return '#';
-    }
-  }, []);
-
   useEffect(() => {
     const fetchDashboardData = async () => {
       try {
-        const [
-          lessonPlansResponse,
-          assessmentsResponse,
-          activitiesResponse,
-          resourcesResponse
-        ] = await Promise.all([
-          api.get('/lesson-plans').catch(() => ({ data: [] })),
-          api.get('/assessments').catch(() => ({ data: [] })),
-          api.get('/activities').catch(() => ({ data: [] })),
-          api.get('/resources').catch(() => ({ data: [] }))
-        ]);
+        // One request returns counts, recent items and activity figures
+        const { data } = await api.get('/dashboard/summary', { params: { recent: 5 } });
+        const { counts } = data;
         
-        // Try to fetch courses, quizzes, and flashcards with error handling
-        let coursesResponse = { data: [] };
-        let quizzesResponse = { data: [] };
-        let flashcardsResponse = { data: [] };
-        
-        try {
-          coursesResponse = await api.get('/courses');
-        } catch (error) {
-          console.log('Courses endpoint not available');
-        }
-        
-        try {
-          quizzesResponse = await api.get('/quizzes');
-        } catch (error) {
-          console.log('Quizzes endpoint not available');
-        }
-        
-        try {
-          flashcardsResponse = await api.get('/flashcards');
-        } catch (error) {
-          console.log('Flashcards endpoint not available');
-        }
-        
-        // Set actual counts
         setStats({
-          lessonPlans: lessonPlansResponse.data.length,
-          assessments: assessmentsResponse.data.length,
-          activities: activitiesResponse.data.length,
-          resources: resourcesResponse.data.length,
-          courses: coursesResponse.data.length,
-          quizzes: quizzesResponse.data.length,
-          flashcardSets: flashcardsResponse.data.length,
-          studentProgress: calculateAverageProgress(coursesResponse.data)
+          lessonPlans: counts.lesson_plans,
+          assessments: counts.assessments,
+          activities: counts.activities,
+          resources: counts.resources,
+          courses: counts.courses,
+          quizzes: counts.quizzes,
+          flashcardSets: counts.flashcard_sets,
+          studentProgress: data.average_progress
         });
         
-        // Calculate activity data
-        const allItems = [
-          ...lessonPlansResponse.data,
-          ...assessmentsResponse.data,
-          ...coursesResponse.data,
-          ...quizzesResponse.data,
-          ...flashcardsResponse.data,
-          ...activitiesResponse.data
-        ];
-        
-        const activityAnalytics = processActivityData(allItems);
-        setActivityData(activityAnalytics);
+        setActivityData({
+          weeklyActivity: data.weekly_activity,
+          popularSubjects: data.popular_subjects,
+          engagementRate: data.engagement_rate
+        });
         
-        // Get recent items (last 5)
-        const sortedItems = allItems
-          .filter(item => item.created_at)
-          .sort((a, b) => new Date(b.created_at) - new Date(a.created_at))
-          .slice(0, 5)
-          .map(item => ({
+        setRecentItems(data.recent.map(item => {
+          const itemType = ITEM_TYPES[item.type];
+          return {
             id: item.id,
             title: item.title,
-            type: getItemType(item),
+            type: itemType ? itemType.label : 'Unknown',
             date: new Date(item.created_at),
-            path: getItemPath(item)
-          }));
-        
-        setRecentItems(sortedItems);
+            path: itemType ? `${itemType.path}/${item.id}` : '#'
+          };
+        }));
         setIsLoading(false);
       } catch (error) {
         console.error('Error fetching dashboard data:', error);
@@ -137,59 +77,7 @@ const Dashboard = () => {
     };
     
     fetchDashboardData();
-  }, [getItemPath]);
-
-  // Calculate average progress across all courses
-  const calculateAverageProgress = (courses) => {
-    if (!courses || courses.length === 0) return 0;
-    const totalProgress = courses.reduce((sum, course) => {
-      return sum + (course.progress_percentage || 0);
-    }, 0);
-    return Math.round(totalProgress / courses.length);
-  };
-
-  // Process activity data for insights
-  const processActivityData = (allItems) => {
-    const now = new Date();
-    const weekAgo = new Date(now - 7 * 24 * 60 * 60 * 1000);
-    
-    // Calculate weekly activity
-    const weeklyItems = allItems.filter(item => 
-      item.created_at && new Date(item.created_at) >= weekAgo
-    );
-    const dailyActivity = Array(7).fill(0);
-    
-    weeklyItems.forEach(item => {
-      const dayIndex = new Date(item.created_at).getDay();
-      dailyActivity[dayIndex]++;
-    });
-    
-    // Calculate popular subjects
-    const subjectCounts = {};
-    allItems.forEach(item => {
-      if (item.subject) {
-        subjectCounts[item.subject] = (subjectCounts[item.subject] || 0) + 1;
-      }
-    });
-    
-    const popularSubjects = Object.entries(subjectCounts)
-      .sort((a, b) => b[1] - a[1])
-      .slice(0, 5)
-      .map(([subject, count]) => ({ subject, count }));
-    
-    // Calculate engagement rate (items created in last 30 days vs total)
-    const monthAgo = new Date(now - 30 * 24 * 60 * 60 * 1000);
-    const recentItems = allItems.filter(item => 
-      item.created_at && new Date(item.created_at) >= monthAgo
-    );
-    const engagementRate = allItems.length ? (recentItems.length / allItems.length) * 100 : 0;
-    
-    return {
-      weeklyActivity: dailyActivity,
-      popularSubjects,
-      engagementRate: Math.round(engagementRate)
-    };
-  };
+  }, []);
 
   // AI tool suggestions based on teacher's profile
   const aiToolSuggestions = [